@@ -0,0 +1,269 @@
+import os
+import threading
+import time
+
+# Arguments every profile starts from (the original fixed launch list)
+BASE_ARGS = [
+    '--disable-blink-features=AutomationControlled',
+    '--disable-dev-shm-usage',
+    '--no-sandbox',
+    '--disable-setuid-sandbox',
+    '--disable-web-security',
+    '--disable-background-timer-throttling',
+    '--disable-backgrounding-occluded-windows',
+    '--disable-renderer-backgrounding',
+]
+
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36'
+
+EXTRA_HTTP_HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Launch profiles for get_timetable():
+#   args             extra Chromium switches on top of BASE_ARGS
+#   disable_features Chromium features to switch off (merged into one flag)
+#   viewport         page size; smaller viewports mean smaller raster buffers
+#   screenshots      whether debug screenshots are taken
+#   block_resources  Playwright resource types that are never downloaded
+LAUNCH_PROFILES = {
+    'default': {
+        'args': [],
+        'disable_features': ['VizDisplayCompositor'],
+        'viewport': {'width': 1366, 'height': 768},
+        'screenshots': True,
+        'block_resources': [],
+    },
+    # For 512 MB hosts: one renderer process, tiny caches, a capped V8 heap,
+    # no GPU/raster helpers, no images or fonts and no screenshots
+    'low-memory': {
+        'args': [
+            '--renderer-process-limit=1',
+            '--process-per-site',
+            '--disable-gpu',
+            '--disable-software-rasterizer',
+            '--disable-extensions',
+            '--disable-background-networking',
+            '--disable-component-update',
+            '--disable-default-apps',
+            '--disable-sync',
+            '--no-first-run',
+            '--mute-audio',
+            '--disk-cache-size=1048576',
+            '--media-cache-size=1048576',
+            '--js-flags=--max-old-space-size=128',
+            # Site isolation would put cross-site frames in renderers of their own
+            '--disable-site-isolation-trials',
+        ],
+        'disable_features': ['VizDisplayCompositor', 'SitePerProcess', 'IsolateOrigins',
+                             'Translate', 'OptimizationHints', 'MediaRouter'],
+        'viewport': {'width': 1024, 'height': 640},
+        'screenshots': False,
+        'block_resources': ['image', 'media', 'font'],
+    },
+}
+
+# Browser engines get_timetable() can drive:
+#   browser_type  Playwright browser type (chromium, firefox or webkit)
+#   channel       Playwright distribution channel; None is the bundled build,
+#                 which for headless Chromium is the headless-only shell
+#                 (Playwright 1.49+, as are the "chromium" channel and engine)
+# Launch profile switches are Chromium switches, so only Chromium engines
+# get them; viewport and resource blocking apply to every engine.
+BROWSER_ENGINES = {
+    'chromium': {'browser_type': 'chromium', 'channel': None},
+    # The full Chromium build in its new headless mode
+    'chromium-full': {'browser_type': 'chromium', 'channel': 'chromium'},
+    # An installed Google Chrome
+    'chrome': {'browser_type': 'chromium', 'channel': 'chrome'},
+    'firefox': {'browser_type': 'firefox', 'channel': None},
+    'webkit': {'browser_type': 'webkit', 'channel': None},
+}
+
+
+def default_browser_engine():
+    """Browser engine name from TIMETABLE_BROWSER_ENGINE, or "chromium" """
+    return os.getenv('TIMETABLE_BROWSER_ENGINE') or 'chromium'
+
+
+def default_browser_executable():
+    """Browser executable from TIMETABLE_BROWSER_EXECUTABLE, or None for Playwright's own build"""
+    return os.getenv('TIMETABLE_BROWSER_EXECUTABLE') or None
+
+
+def get_browser_engine(name=None):
+    """
+    Look up a browser engine by name (default: default_browser_engine())
+    """
+    name = name or default_browser_engine()
+    if name not in BROWSER_ENGINES:
+        raise ValueError(f"Unknown browser engine {name!r}, expected one of {list(BROWSER_ENGINES)}")
+    return BROWSER_ENGINES[name]
+
+
+def default_launch_profile():
+    """Launch profile name from TIMETABLE_LAUNCH_PROFILE, or "default" """
+    return os.getenv('TIMETABLE_LAUNCH_PROFILE') or 'default'
+
+
+def get_launch_profile(name=None):
+    """
+    Look up a launch profile by name (default: default_launch_profile())
+    """
+    name = name or default_launch_profile()
+    if name not in LAUNCH_PROFILES:
+        raise ValueError(f"Unknown launch profile {name!r}, expected one of {list(LAUNCH_PROFILES)}")
+    return LAUNCH_PROFILES[name]
+
+
+def launch_args(profile, engine=None):
+    """Full argument list for a launch profile (empty for non-Chromium engines)"""
+    if engine is not None and engine['browser_type'] != 'chromium':
+        return []
+    args = BASE_ARGS + profile['args']
+    if profile['disable_features']:
+        args.append('--disable-features=' + ','.join(profile['disable_features']))
+    return args
+
+
+def launch_browser(playwright, profile, headless=True, storage_state=None, engine=None, executable_path=None):
+    """
+    Launch a browser (default: the engine from default_browser_engine()) and
+    open a context configured by the launch profile, optionally restoring a
+    saved session (cookies and local storage). executable_path runs another
+    build of the engine, e.g. a distribution's chromium-headless-shell.
+
+    Returns:
+        tuple: (browser, context)
+    """
+    engine = engine or get_browser_engine()
+    options = {'headless': headless, 'args': launch_args(profile, engine)}
+    if engine['channel'] and not executable_path:
+        options['channel'] = engine['channel']
+    if executable_path:
+        options['executable_path'] = executable_path
+    browser = getattr(playwright, engine['browser_type']).launch(**options)
+    context = browser.new_context(
+        storage_state=storage_state,
+        viewport=profile['viewport'],
+        user_agent=USER_AGENT,
+        extra_http_headers=EXTRA_HTTP_HEADERS,
+        service_workers='block' if profile['block_resources'] else 'allow',
+    )
+
+    if profile['block_resources']:
+        blocked = set(profile['block_resources'])
+
+        def block(route):
+            if route.request.resource_type in blocked:
+                route.abort()
+            else:
+                route.continue_()
+
+        context.route('**/*', block)
+    return browser, context
+
+
+def child_processes(root_pid):
+    """PIDs of every descendant of root_pid (Linux only, empty elsewhere)"""
+    children = {}
+    try:
+        pids = [entry for entry in os.listdir('/proc') if entry.isdigit()]
+    except OSError:
+        return []
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/stat', 'rb') as f:
+                # The command name may contain spaces, so split after its ")"
+                fields = f.read().rsplit(b')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        children.setdefault(int(fields[1]), []).append(int(pid))
+
+    found = []
+    pending = [root_pid]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            found.append(child)
+            pending.append(child)
+    return found
+
+
+def process_memory(pid):
+    """
+    Memory of one process in bytes: proportional set size where the kernel
+    reports it (so pages shared between Chromium processes are not counted
+    several times), resident set size otherwise. 0 if unavailable.
+    """
+    try:
+        with open(f'/proc/{pid}/smaps_rollup', 'rb') as f:
+            for line in f:
+                if line.startswith(b'Pss:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        with open(f'/proc/{pid}/statm', 'rb') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+class MemoryMonitor:
+    """
+    Samples the memory of this Python process and of the browser (every
+    child process: the Playwright driver and Chromium) on a background
+    thread and keeps the peaks. Per-process memory comes from /proc, so
+    nothing is reported outside Linux.
+    """
+
+    def __init__(self, interval=0.25):
+        self.interval = interval
+        self.pid = os.getpid()
+        self.peak_python = 0
+        self.peak_browser = 0
+        self.peak_browser_processes = 0
+        self.running = threading.Event()
+        self.thread = None
+
+    def sample(self):
+        self.peak_python = max(self.peak_python, process_memory(self.pid))
+        children = child_processes(self.pid)
+        self.peak_browser = max(self.peak_browser, sum(process_memory(pid) for pid in children))
+        self.peak_browser_processes = max(self.peak_browser_processes, len(children))
+
+    def _run(self):
+        while self.running.is_set():
+            self.sample()
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.running.set()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.running.clear()
+        self.thread.join()
+        return False
+
+    def report(self):
+        """Peak memory as a dict of MiB values"""
+        return {
+            'python_mib': round(self.peak_python / 1024 / 1024, 1),
+            'browser_mib': round(self.peak_browser / 1024 / 1024, 1),
+            'browser_processes': self.peak_browser_processes,
+        }
+
+    def summary(self):
+        report = self.report()
+        if not (report['python_mib'] or report['browser_mib']):
+            return "Peak memory: not available on this platform"
+        return (f"Peak memory: browser {report['browser_mib']} MiB across {report['browser_processes']} processes, "
+                f"Python {report['python_mib']} MiB")
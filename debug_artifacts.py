@@ -0,0 +1,172 @@
+import datetime
+import gzip
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Get the directory where this script is located
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+ARTIFACTS_DIR = os.path.join(SCRIPT_DIR, "debug_artifacts")
+
+logger = logging.getLogger(__name__)
+
+# What gets kept:
+#   off     nothing, not even on errors (production hosts)
+#   errors  screenshots and page source only when a step fails
+#   all     also the screenshot and page source of successful runs
+ARTIFACT_MODES = ('off', 'errors', 'all')
+DEFAULT_ARTIFACT_MODE = 'errors'
+
+# Retention across runs; the oldest runs are removed first
+ARTIFACT_MAX_RUNS = 20
+ARTIFACT_MAX_BYTES = 50 * 1024 * 1024
+ARTIFACT_MAX_AGE = 7 * 24 * 60 * 60
+
+
+def default_artifact_mode():
+    """Artifact mode from TIMETABLE_DEBUG_ARTIFACTS, or "errors" """
+    mode = os.getenv('TIMETABLE_DEBUG_ARTIFACTS') or DEFAULT_ARTIFACT_MODE
+    if mode not in ARTIFACT_MODES:
+        raise ValueError(f"Unknown debug artifact mode {mode!r}, expected one of {ARTIFACT_MODES}")
+    return mode
+
+
+class ArtifactStore:
+    """
+    Debug screenshots and page sources of one run, kept in
+    debug_artifacts/<run id>/:
+
+        <name>.png        screenshot
+        <name>.html.gz    gzip-compressed page source
+
+    Capturing happens on the caller's thread (Playwright pages are not
+    thread-safe), but files are written on a background thread so disk I/O
+    stays off the fetch. close() waits for pending writes and then prunes
+    old runs by count, total size and age. Files may contain timetable
+    details, so they are readable by the owner only.
+    """
+
+    def __init__(self, mode=None, label='fetch', root=ARTIFACTS_DIR, max_runs=ARTIFACT_MAX_RUNS,
+                 max_bytes=ARTIFACT_MAX_BYTES, max_age=ARTIFACT_MAX_AGE):
+        self.mode = mode or default_artifact_mode()
+        if self.mode not in ARTIFACT_MODES:
+            raise ValueError(f"Unknown debug artifact mode {self.mode!r}, expected one of {ARTIFACT_MODES}")
+        self.run_id = f"{label}-{datetime.datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        self.root = root
+        self.output_dir = os.path.join(root, self.run_id)
+        self.max_runs = max_runs
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.executor = None
+        self.saved = []
+
+    def wants(self, on_error=True):
+        """Whether an artifact should be captured at all; check before paying for a screenshot"""
+        if self.mode == 'off':
+            return False
+        return on_error or self.mode == 'all'
+
+    def save_screenshot(self, name, page, on_error=True, **kwargs):
+        """Screenshot page into <name>.png"""
+        if not self.wants(on_error):
+            return
+        try:
+            data = page.screenshot(**kwargs)
+        except Exception as e:
+            logger.warning("Could not take screenshot %s: %s", name, e)
+            return
+        self._submit(f"{name}.png", data, compress=False)
+
+    def save_html(self, name, html, on_error=True):
+        """Compress the page source html into <name>.html.gz"""
+        if not self.wants(on_error):
+            return
+        self._submit(f"{name}.html.gz", html.encode('utf-8'), compress=True)
+
+    def _submit(self, filename, data, compress):
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='artifacts')
+        self.executor.submit(self._write, filename, data, compress)
+
+    def _write(self, filename, data, compress):
+        path = os.path.join(self.output_dir, filename)
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                if compress:
+                    with gzip.GzipFile(filename=filename[:-3], mode='wb', fileobj=f, compresslevel=6) as gz:
+                        gz.write(data)
+                else:
+                    f.write(data)
+            self.saved.append(path)
+            logger.debug("Saved debug artifact %s", path)
+        except OSError as e:
+            logger.warning("Could not save debug artifact %s: %s", filename, e)
+
+    def close(self):
+        """Finish pending writes, then prune old runs"""
+        if self.executor is None:
+            return
+        self.executor.shutdown(wait=True)
+        self.executor = None
+        if self.saved:
+            logger.info("Debug artifacts saved to %s", self.output_dir)
+        prune_artifacts(self.root, self.max_runs, self.max_bytes, self.max_age)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def _directory_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def prune_artifacts(root=ARTIFACTS_DIR, max_runs=ARTIFACT_MAX_RUNS, max_bytes=ARTIFACT_MAX_BYTES,
+                    max_age=ARTIFACT_MAX_AGE):
+    """
+    Delete run directories older than max_age, then the oldest runs until at
+    most max_runs remain and together they take at most max_bytes.
+
+    Returns:
+        list: Removed run directories
+    """
+    try:
+        entries = [os.path.join(root, name) for name in os.listdir(root)]
+    except OSError:
+        return []
+    runs = []
+    for path in entries:
+        try:
+            if os.path.isdir(path):
+                runs.append((os.path.getmtime(path), path, _directory_size(path)))
+        except OSError:
+            continue
+    runs.sort()
+
+    now = time.time()
+    total = sum(size for _, _, size in runs)
+    removed = []
+    for mtime, path, size in runs:
+        remaining = len(runs) - len(removed)
+        if now - mtime <= max_age and remaining <= max_runs and total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        removed.append(path)
+        total -= size
+    if removed:
+        logger.debug("Removed %s old debug artifact runs", len(removed))
+    return removed
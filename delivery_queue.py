@@ -0,0 +1,228 @@
+import asyncio
+import collections
+import heapq
+import itertools
+import logging
+import time
+
+from telegram import TelegramClient, get_media_cache
+
+# Lower numbers are delivered first
+PRIORITY_TEXT = 0
+PRIORITY_IMAGE = 10
+PRIORITY_DOCUMENT = 20
+
+# Telegram's documented limits: about 30 messages per second overall and
+# about one message per second per chat (20 per minute in groups)
+DEFAULT_GLOBAL_RATE = 30.0
+DEFAULT_PER_CHAT_RATE = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """
+    Asyncio token bucket refilled at `rate` tokens per second up to `capacity`
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        return now
+
+    def ready_at(self):
+        """Monotonic time at which a token will be available"""
+        now = self._refill()
+        # updated may lie ahead of now (see DeliveryQueue.run)
+        start = max(now, self.updated)
+        return start if self.tokens >= 1 else start + (1 - self.tokens) / self.rate
+
+    def try_acquire(self):
+        """Take a token if one is available now, without waiting"""
+        if self.ready_at() > time.monotonic():
+            return False
+        self.tokens -= 1
+        return True
+
+    async def acquire(self):
+        """Wait until a token is available and take it"""
+        async with self.lock:
+            while not self.try_acquire():
+                await asyncio.sleep(max(0.0, self.ready_at() - time.monotonic()))
+
+
+class DeliveryQueue:
+    """
+    Rate-limited fan-out of Telegram sends to many chats.
+
+    Jobs are delivered by a bounded pool of workers. Each send takes a token
+    from its chat's bucket and from the global bucket, so the queue runs at
+    the highest rate Telegram allows without tripping 429s. Workers only
+    pick up jobs whose chat has a token now (lowest priority value first,
+    each chat in its own order), so a backlog for one chat never holds up
+    the others.
+    Sends themselves go through TelegramClient (which still handles any 429
+    or transient error) on worker threads.
+    """
+
+    def __init__(self, client, global_rate=DEFAULT_GLOBAL_RATE, per_chat_rate=DEFAULT_PER_CHAT_RATE,
+                 per_chat_burst=1, concurrency=8):
+        if isinstance(client, str):
+            client = TelegramClient(client, pool_size=concurrency, media_cache=get_media_cache())
+        self.client = client
+        self.global_rate = global_rate
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.concurrency = concurrency
+        self.jobs = []
+        self._sequence = itertools.count()
+
+    def add(self, chat_id, method, *args, priority=PRIORITY_TEXT, **kwargs):
+        """
+        Queue a call to a TelegramClient send method, e.g. "send_message"
+        """
+        self.jobs.append({
+            'id': next(self._sequence),
+            'priority': priority,
+            'chat_id': chat_id,
+            'method': method,
+            'args': args,
+            'kwargs': kwargs,
+        })
+
+    def add_message(self, chat_id, message, priority=PRIORITY_TEXT):
+        """Queue a text message"""
+        self.add(chat_id, 'send_message', message, priority=priority)
+
+    def add_photo(self, chat_id, photo_path, caption="", priority=PRIORITY_IMAGE):
+        """Queue a photo upload"""
+        self.add(chat_id, 'send_photo', photo_path, caption, priority=priority)
+
+    def add_document(self, chat_id, file_path, caption="", priority=PRIORITY_DOCUMENT):
+        """Queue a document upload"""
+        self.add(chat_id, 'send_document', file_path, caption, priority=priority)
+
+    async def run(self):
+        """
+        Deliver every queued job.
+
+        Returns:
+            list: One result dict per job, in the order the jobs were added,
+            with 'chat_id', 'method', 'ok', 'response', 'error', 'latency'
+            (seconds from start of run to completion) and 'send_time'
+            (seconds spent in the API call).
+        """
+        # No burst allowance globally: Telegram measures its limit over a
+        # sliding second, which a full bucket would overshoot
+        global_bucket = TokenBucket(self.global_rate)
+        chat_buckets = {}
+        chat_jobs = {}
+        for job in sorted(self.jobs, key=lambda job: (job['priority'], job['id'])):
+            chat_jobs.setdefault(job['chat_id'], collections.deque()).append(job)
+        self.jobs = []
+
+        # One entry per chat with jobs left: (priority, id, chat) of its next
+        # job in ready once its bucket has a token, (time, priority, id,
+        # chat) in waiting until then
+        ready = []
+        waiting = []
+        for chat_id, jobs in chat_jobs.items():
+            chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, capacity=self.per_chat_burst)
+            heapq.heappush(ready, (jobs[0]['priority'], jobs[0]['id'], chat_id))
+
+        results = {}
+        started = time.monotonic()
+
+        def next_job():
+            """Take the most urgent job whose chat can send now, or None"""
+            now = time.monotonic()
+            while waiting and waiting[0][0] <= now:
+                _, priority, job_id, chat_id = heapq.heappop(waiting)
+                heapq.heappush(ready, (priority, job_id, chat_id))
+            while ready:
+                priority, job_id, chat_id = heapq.heappop(ready)
+                bucket = chat_buckets[chat_id]
+                if not bucket.try_acquire():
+                    heapq.heappush(waiting, (bucket.ready_at(), priority, job_id, chat_id))
+                    continue
+                jobs = chat_jobs[chat_id]
+                job = jobs.popleft()
+                if jobs:
+                    heapq.heappush(waiting, (bucket.ready_at(), jobs[0]['priority'], jobs[0]['id'], chat_id))
+                return job
+            return None
+
+        async def worker():
+            while True:
+                job = next_job()
+                if job is None:
+                    if not waiting:
+                        return
+                    await asyncio.sleep(max(0.0, waiting[0][0] - time.monotonic()))
+                    continue
+
+                job_id = job['id']
+                bucket = chat_buckets[job['chat_id']]
+                await global_bucket.acquire()
+                # Refill the chat's bucket from the moment the request really
+                # goes out, not from when its token was taken
+                bucket.updated = max(bucket.updated, time.monotonic())
+
+                send_started = time.monotonic()
+                response = None
+                error = None
+                try:
+                    send = getattr(self.client, job['method'])
+                    response = await asyncio.to_thread(send, job['chat_id'], *job['args'], **job['kwargs'])
+                except Exception as e:
+                    error = str(e)
+                finished = time.monotonic()
+
+                results[job_id] = {
+                    'chat_id': job['chat_id'],
+                    'method': job['method'],
+                    'ok': bool(response and response.get('ok')),
+                    'response': response,
+                    'error': error,
+                    'latency': finished - started,
+                    'send_time': finished - send_started,
+                }
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return [results[job_id] for job_id in sorted(results)]
+
+    def deliver(self):
+        """
+        Synchronous wrapper around run()
+        """
+        return asyncio.run(self.run())
+
+
+def fan_out(bot_token, chat_ids, message=None, photo_path=None, caption="", **queue_options):
+    """
+    Send the same text and/or photo to many chats. Text goes out before images.
+
+    Returns:
+        list: Per-message delivery results, see DeliveryQueue.run().
+    """
+    queue = DeliveryQueue(bot_token, **queue_options)
+    for chat_id in chat_ids:
+        if message:
+            queue.add_message(chat_id, message)
+        if photo_path:
+            queue.add_photo(chat_id, photo_path, caption)
+    results = queue.deliver()
+
+    delivered = sum(1 for result in results if result['ok'])
+    logger.log(logging.INFO if delivered == len(results) else logging.WARNING,
+               "Delivered %s/%s messages to %s chats", delivered, len(results), len(chat_ids))
+    return results
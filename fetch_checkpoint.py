@@ -0,0 +1,113 @@
+import datetime
+import hashlib
+import json
+import logging
+import os
+import time
+
+# Get the directory where this script is located
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CHECKPOINT_DIR = os.path.join(SCRIPT_DIR, "checkpoints")
+
+logger = logging.getLogger(__name__)
+
+# PeopleSoft drops idle sessions after about 20 minutes
+CHECKPOINT_MAX_AGE = 15 * 60
+
+FETCH_STEPS = ['login', 'landing_grouplet', 'schedule_component', 'date_set', 'refresh', 'extract']
+
+# The date and refresh steps only change form state inside the page, which a
+# new page does not have, so resuming after them starts from the date again
+RESUME_AFTER = {
+    'login': 'login',
+    'landing_grouplet': 'landing_grouplet',
+    'schedule_component': 'schedule_component',
+    'date_set': 'schedule_component',
+    'refresh': 'schedule_component',
+}
+
+
+class FetchCheckpoint:
+    """
+    Progress of one account's fetch, saved after every good step:
+
+        step           last completed step (one of FETCH_STEPS)
+        urls           {step: page URL after that step}; after
+                       schedule_component this is the resolved iframe URL
+        storage_state  Playwright session state (cookies, local storage)
+        saved_at       unix time
+
+    A checkpoint holds live session cookies, so it is written readable by
+    the owner only and ignored once older than max_age.
+    """
+
+    def __init__(self, username, checkpoint_dir=CHECKPOINT_DIR, max_age=CHECKPOINT_MAX_AGE):
+        account = hashlib.sha256((username or '').encode('utf-8')).hexdigest()[:16]
+        self.path = os.path.join(checkpoint_dir, f"fetch-{account}.json")
+        self.max_age = max_age
+        self.urls = {}
+        self.record = None
+
+    def load(self):
+        """The saved checkpoint, or None if there is none or it expired"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - record.get('saved_at', 0) > self.max_age or record.get('step') not in RESUME_AFTER:
+            self.clear()
+            return None
+        self.record = record
+        self.urls = dict(record.get('urls', {}))
+        return record
+
+    def resume_point(self):
+        """
+        (index into FETCH_STEPS to resume at, URL to open first), or
+        (0, None) to start from the sign-on page
+        """
+        if self.record is None:
+            return 0, None
+        step = RESUME_AFTER[self.record['step']]
+        url = self.urls.get(step)
+        if not url:
+            return 0, None
+        return FETCH_STEPS.index(step) + 1, url
+
+    def save(self, step, context, url):
+        """Record a completed step with the current session state"""
+        self.urls[step] = url
+        if step not in RESUME_AFTER:
+            return
+        record = {
+            'step': step,
+            'urls': self.urls,
+            'storage_state': context.storage_state(),
+            'saved_at': time.time(),
+        }
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = self.path + '.tmp'
+        try:
+            fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(record, f)
+            os.replace(temp_path, self.path)
+            self.record = record
+        except OSError as e:
+            logger.warning("Could not save fetch checkpoint: %s", e)
+
+    def clear(self):
+        """Forget the checkpoint (after a finished fetch or an expired session)"""
+        self.record = None
+        self.urls = {}
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def describe(self):
+        if self.record is None:
+            return "no checkpoint"
+        saved_at = datetime.datetime.fromtimestamp(self.record['saved_at'])
+        return f"checkpoint after {self.record['step']} from {saved_at:%H:%M:%S}"
@@ -1,15 +1,48 @@
 from timetableFinder import get_timetable
+import argparse
+import logging
+import threading
+import atexit
+import contextlib
 import datetime
+from concurrent.futures import Future, ThreadPoolExecutor
 import pandas as pd
 import os
-from telegram import send_telegram_csv, send_telegram_message, send_telegram_photo
+from telegram import MessageBuilder
+from outbox import Outbox
+from timetable_data import extract_lessons, next_working_day
 from timetable_image_generator import create_simple_timetable_image
+from profiling import PROFILE_MODES, ProfileSession, profile_stage
+from browser_launch import BROWSER_ENGINES, LAUNCH_PROFILES
+from debug_artifacts import ARTIFACT_MODES
+from run_log import configure_logging, dump_recent_logs
 import platform
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
 load_dotenv()
 
+parser = argparse.ArgumentParser(description="Send the next working day's timetable to Telegram")
+parser.add_argument('--profile', nargs='?', const='deterministic', choices=PROFILE_MODES,
+                    help="Profile the parser and renderer hot paths and write artifacts to profiles/")
+parser.add_argument('--launch-profile', choices=list(LAUNCH_PROFILES),
+                    help="Browser launch profile, e.g. low-memory for small hosts (default: TIMETABLE_LAUNCH_PROFILE or default)")
+parser.add_argument('--browser-engine', choices=list(BROWSER_ENGINES),
+                    help="Browser engine (default: TIMETABLE_BROWSER_ENGINE or chromium); TIMETABLE_BROWSER_EXECUTABLE selects another build")
+parser.add_argument('--debug-artifacts', choices=ARTIFACT_MODES,
+                    help="Debug screenshots and page sources to keep in debug_artifacts/ (default: TIMETABLE_DEBUG_ARTIFACTS or errors)")
+parser.add_argument('--log-level', choices=['DEBUG', 'INFO', 'WARNING', 'ERROR'],
+                    help="Console log level (default: TIMETABLE_LOG_LEVEL or WARNING); failed runs always dump recent DEBUG records")
+args = parser.parse_args()
+configure_logging(args.log_level)
+logger = logging.getLogger("main")
+
+# One profile session covers the whole run, including early exits
+profiler = contextlib.ExitStack()
+atexit.register(profiler.close)
+if args.profile:
+    profiler.enter_context(ProfileSession(args.profile, label='main'))
+
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -21,99 +54,141 @@ TELEGRAM_CHANNEL_ID = os.getenv('TELEGRAM_CHANNEL_ID')
 
 # Validate that all required environment variables are set
 if not all([USERNAME, PASSWORD, TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID]):
-    print("Error: Missing required environment variables. Please check your .env file.")
+    logger.error("Missing required environment variables. Please check your .env file.")
     exit(1)
 
 # start_date = datetime.date(2025, 9, 14)
 start_date = datetime.datetime.now()
 format_str = "%#d %b" if platform.system() == "Windows" else "%-d %b"
-next_working_day_str = (start_date + datetime.timedelta(days=3 if start_date.weekday() == 4 else (2 if start_date.weekday() == 5 else (1 if start_date.weekday() == 6 else 1)))).strftime(format_str)
-
-# # Or use with custom credentials and settings
-df = get_timetable(
-    username=USERNAME,
-    password=PASSWORD,
-    headless=True,  # Run in headless mode
-    output_filename="my_timetable",
-    start_date=start_date
-)
-# df = pd.read_csv("weekly_schedule_timetable.csv")
+next_working_day_str = next_working_day(start_date).strftime(format_str)
 
-# Check if DataFrame was successfully retrieved
-if df is None:
-    print("Failed to retrieve timetable data. Exiting.")
-    exit(1)
+# Deliveries are recorded in the outbox; the scope keeps re-runs on the same
+# day from sending the same content twice
+outbox = Outbox()
+run_scope = start_date.strftime("%Y-%m-%d")
 
-lessons = []
-for col in df.columns:
-    if next_working_day_str in col:
-        for row in df[col].dropna():
-            # Check if row is not empty and contains the expected format
-            if row and isinstance(row, str) and '|' in row:
-                parts = row.split('|')
-                # Ensure we have exactly 5 parts
-                if len(parts) == 5:
-                    modCode, modName, modType, modTime, modRoom = parts
-                    lesson = {
-                        "modCode": modCode,
-                        "modName": modName,
-                        "modType": modType,
-                        "modTime": modTime,
-                        "modRoom": modRoom
-                    }
-                    # Check if this lesson is already in the list
-                    if lesson not in lessons:
-                        lessons.append(lesson)
-                        print("-----------------")
-                    else:
-                        print(f"Duplicate lesson skipped: {modCode} - {modTime}")
-                else:
-                    print(f"Skipping row with unexpected format: {row}")
-            else:
-                print(f"Skipping empty or invalid row: {repr(row)}")
+# The run is a small pipeline: independent stages run on worker threads so
+# the day's message goes out as soon as the lessons are known, while the
+# browser shuts down and the Sunday image renders and uploads in the
+# background. Worker threads open their own Outbox (SQLite connections
+# cannot be shared between threads).
+pipeline = ThreadPoolExecutor(max_workers=3, thread_name_prefix="pipeline")
+# Set by any stage that fails, so the recent log records are dumped at the end
+run_failed = threading.Event()
 
-# Remove duplicates using a more robust method
-unique_lessons = []
-seen = set()
-for lesson in lessons:
-    lesson_id = f"{lesson['modCode']}|{lesson['modTime']}|{lesson['modRoom']}"
-    if lesson_id not in seen:
-        seen.add(lesson_id)
-        unique_lessons.append(lesson)
-    else:
-        print(f"Removing duplicate: {lesson['modCode']} at {lesson['modTime']}")
 
-lessons = unique_lessons
-print(f"Final lessons count: {len(lessons)}")
-print(lessons)
+def drain_outbox():
+    """Retry anything left over from earlier runs"""
+    leftover = Outbox()
+    try:
+        # Today's deliveries are (re)sent by this run's own outbox.send calls
+        leftover.drain(TELEGRAM_BOT_TOKEN, skip_scope=run_scope)
+    finally:
+        leftover.close()
 
-# Generate and send timetable image only if today is Sunday
-if start_date.weekday() == 6:  # Sunday is 6 in Python's weekday()
+
+def send_weekly_image():
+    """Render the week image and send it (Sundays only)"""
     csv_path = os.path.join(SCRIPT_DIR, "weekly_schedule_timetable.csv")
     image_path = os.path.join(SCRIPT_DIR, "timetable_image.png")
 
     try:
-        print("Generating timetable image...")
+        logger.debug("Generating timetable image...")
         create_simple_timetable_image(csv_path, image_path)
-        print(f"Timetable image saved to: {image_path}")
-        
+        logger.info("Timetable image saved to: %s", image_path)
+
         # Send image via Telegram
-        print("Sending timetable image via Telegram...")
-        send_telegram_photo(TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID, image_path, 
-                           caption="📅 Weekly Timetable")
-        print("Timetable image sent successfully!")
-        
+        logger.debug("Sending timetable image via Telegram...")
+        image_outbox = Outbox()
+        try:
+            if image_outbox.send(TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID, 'send_photo', image_path,
+                                 "📅 Weekly Timetable", scope=run_scope):
+                logger.info("Timetable image sent successfully!")
+            else:
+                logger.warning("Timetable image queued in the outbox for retry (python outbox.py)")
+                run_failed.set()
+        finally:
+            image_outbox.close()
+
     except Exception as e:
-        print(f"Error generating or sending timetable image: {e}")
+        logger.error("Error generating or sending timetable image: %s", e)
+        run_failed.set()
+
+
+# Leftover deliveries are retried while the portal is scraped
+drain_task = pipeline.submit(drain_outbox)
+
+# get_timetable() hands the data over before it closes the browser
+data_ready = Future()
+
+
+def fetch_timetable():
+    try:
+        return get_timetable(
+            username=USERNAME,
+            password=PASSWORD,
+            headless=True,  # Run in headless mode
+            output_filename="my_timetable",
+            start_date=start_date,
+            launch_profile=args.launch_profile,
+            browser_engine=args.browser_engine,
+            debug_artifacts=args.debug_artifacts,
+            on_data=data_ready.set_result
+        )
+    finally:
+        if not data_ready.done():
+            data_ready.set_result(None)
+
+
+fetch_task = pipeline.submit(fetch_timetable)
+df = data_ready.result()
+# df = pd.read_csv("weekly_schedule_timetable.csv")
+
+# Check if DataFrame was successfully retrieved
+if df is None:
+    if fetch_task.exception() is not None:
+        logger.error("Error fetching timetable: %s", fetch_task.exception())
+    logger.error("Failed to retrieve timetable data. Exiting.")
+    pipeline.shutdown(wait=True)
+    dump_recent_logs("Timetable fetch failed")
+    exit(1)
+
+# Generate and send timetable image only if today is Sunday
+image_task = None
+if start_date.weekday() == 6:  # Sunday is 6 in Python's weekday()
+    image_task = pipeline.submit(send_weekly_image)
 else:
-    print("Today is not Sunday. Skipping timetable image generation.")
-    
-message = """
-Today's timetable:
-"""
+    logger.debug("Today is not Sunday. Skipping timetable image generation.")
+
+with profile_stage('extract_lessons'):
+    lessons = extract_lessons(df, next_working_day_str)
+logger.info("Final lessons count: %s", len(lessons))
+logger.debug("Lessons: %s", lessons)
+
+message = MessageBuilder("Today's timetable:")
 for lesson in lessons:
-    message += f"""
-{lesson["modCode"]}\n{lesson["modName"]}\n{lesson["modType"]}\n{lesson["modTime"]}\n{lesson["modRoom"]}\n
-"""
-    
-send_telegram_message(TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID, message)
\ No newline at end of file
+    message.add(lesson["modCode"], lesson["modName"], lesson["modType"], lesson["modTime"], lesson["modRoom"])
+
+# Each part goes through the outbox so a failed send can be retried with
+# `python outbox.py` instead of re-running the whole scrape
+for part in message.chunks():
+    if not outbox.send(TELEGRAM_BOT_TOKEN, TELEGRAM_CHANNEL_ID, 'send_message', part, scope=run_scope):
+        logger.warning("Message queued in the outbox for retry (python outbox.py)")
+        run_failed.set()
+
+# Wait for the browser teardown, the image upload and the outbox drain
+for task in (fetch_task, image_task, drain_task):
+    if task is None:
+        continue
+    try:
+        task.result()
+    except Exception as e:
+        logger.error("Background task failed: %s", e)
+        run_failed.set()
+pipeline.shutdown()
+
+outbox.close()
+
+# Successful runs stay quiet; failed ones get the full recent context
+if run_failed.is_set():
+    dump_recent_logs("Run finished with failures")
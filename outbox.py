@@ -0,0 +1,331 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import time
+
+from run_log import configure_logging
+from telegram import get_client
+
+# Get the directory where this script is located
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTBOX_PATH = os.path.join(SCRIPT_DIR, "outbox.sqlite3")
+OUTBOX_FILES_DIR = os.path.join(SCRIPT_DIR, "outbox_files")
+
+logger = logging.getLogger(__name__)
+
+# TelegramClient methods the outbox may replay, and which of their
+# positional arguments (after chat_id) are local file paths
+OUTBOX_METHODS = {
+    'send_message': [],
+    'send_photo': [0],
+    'send_document': [0],
+    'send_media_group': [0],
+}
+
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_RETRY_BASE = 30.0
+DEFAULT_RETRY_MAX = 3600.0
+# A delivery claimed by a drain that never finished (e.g. the process was
+# killed mid-send) becomes due again after this many seconds
+CLAIM_LEASE = 300.0
+# Sent and given-up deliveries are deleted, with their stored files, once
+# they are this many seconds old
+DEFAULT_RETENTION = 14 * 24 * 60 * 60
+# Unreferenced stored files younger than this are kept, as a delivery being
+# enqueued right now may be about to reference them
+FILE_GRACE = 3600.0
+
+
+class Outbox:
+    """
+    Durable queue of pending Telegram deliveries stored in SQLite.
+
+    Every delivery has an idempotency key; enqueueing an already known key is
+    a no-op, and a delivery is claimed before it is sent, so re-running
+    main.py or running several drains never sends the same thing twice. Files are copied into a content-addressed directory so a
+    retry sends exactly what was queued even if the original was overwritten.
+    Finished deliveries and files no delivery uses any more are removed
+    after a full drain (see purge()).
+    """
+
+    def __init__(self, path=OUTBOX_PATH, files_dir=OUTBOX_FILES_DIR):
+        self.path = path
+        self.files_dir = files_dir
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS deliveries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                chat_id TEXT NOT NULL,
+                method TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                sent_at REAL
+            )
+        """)
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS deliveries_due ON deliveries (status, next_attempt_at)")
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+    def _store_file(self, file_path):
+        """Copy a file into the outbox directory, named by its content hash"""
+        with open(file_path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()
+        stored_path = os.path.join(self.files_dir, digest + os.path.splitext(file_path)[1])
+        if not os.path.exists(stored_path):
+            os.makedirs(self.files_dir, exist_ok=True)
+            shutil.copyfile(file_path, stored_path)
+        else:
+            # Reused: keep purge() from treating it as an old orphan
+            os.utime(stored_path)
+        return stored_path
+
+    def enqueue(self, chat_id, method, *args, scope="", key=None):
+        """
+        Record a delivery to be made.
+
+        Args:
+            chat_id: Target chat.
+            method (str): A key of OUTBOX_METHODS, e.g. "send_message".
+            *args: Arguments for the method after chat_id.
+            scope (str): Prefix for the default idempotency key, e.g. a run
+                date, so identical content on different days is still sent.
+            key (str, optional): Explicit idempotency key.
+
+        Returns:
+            tuple: (delivery id, True if newly queued).
+        """
+        if method not in OUTBOX_METHODS:
+            raise ValueError(f"Unsupported outbox method: {method}")
+
+        args = list(args)
+        for index in OUTBOX_METHODS[method]:
+            if isinstance(args[index], (list, tuple)):
+                args[index] = [self._store_file(path) for path in args[index]]
+            else:
+                args[index] = self._store_file(args[index])
+
+        payload = json.dumps(args)
+        if key is None:
+            digest = hashlib.sha256(f"{chat_id}\0{method}\0{payload}".encode('utf-8')).hexdigest()
+            key = f"{scope}:{digest}" if scope else digest
+
+        now = time.time()
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO deliveries (idempotency_key, chat_id, method, payload, next_attempt_at, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, str(chat_id), method, payload, now, now))
+        self.conn.commit()
+        if cursor.rowcount:
+            return cursor.lastrowid, True
+
+        row = self.conn.execute("SELECT id FROM deliveries WHERE idempotency_key = ?", (key,)).fetchone()
+        return row['id'], False
+
+    def due(self, ids=None, now=None, skip_scope=None):
+        """
+        Pending (or abandoned in-flight) deliveries that are due, oldest
+        first, leaving out those queued with scope skip_scope
+        """
+        now = time.time() if now is None else now
+        query = "SELECT * FROM deliveries WHERE status IN ('pending', 'sending') AND next_attempt_at <= ?"
+        params = [now]
+        if ids is not None:
+            query += f" AND id IN ({','.join('?' * len(ids))})"
+            params += list(ids)
+        if skip_scope:
+            prefix = f"{skip_scope}:"
+            query += " AND substr(idempotency_key, 1, ?) != ?"
+            params += [len(prefix), prefix]
+        return self.conn.execute(query + " ORDER BY id", params).fetchall()
+
+    def claim(self, delivery_id):
+        """
+        Mark a due delivery as in flight so concurrent drains skip it.
+        Returns False if another drain got there first.
+        """
+        now = time.time()
+        cursor = self.conn.execute(
+            "UPDATE deliveries SET status = 'sending', next_attempt_at = ? "
+            "WHERE id = ? AND status IN ('pending', 'sending') AND next_attempt_at <= ?",
+            (now + CLAIM_LEASE, delivery_id, now))
+        self.conn.commit()
+        return cursor.rowcount == 1
+
+    def mark_sent(self, delivery_id):
+        self.conn.execute(
+            "UPDATE deliveries SET status = 'sent', attempts = attempts + 1, sent_at = ?, last_error = NULL "
+            "WHERE id = ?", (time.time(), delivery_id))
+        self.conn.commit()
+
+    def mark_failed(self, delivery_id, error, max_attempts=DEFAULT_MAX_ATTEMPTS,
+                    retry_base=DEFAULT_RETRY_BASE, retry_max=DEFAULT_RETRY_MAX):
+        """Schedule the next attempt with exponential backoff, or give up"""
+        row = self.conn.execute("SELECT attempts FROM deliveries WHERE id = ?", (delivery_id,)).fetchone()
+        attempts = row['attempts'] + 1
+        status = 'failed' if attempts >= max_attempts else 'pending'
+        next_attempt_at = time.time() + min(retry_max, retry_base * (2 ** (attempts - 1)))
+        self.conn.execute(
+            "UPDATE deliveries SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?",
+            (status, attempts, next_attempt_at, str(error), delivery_id))
+        self.conn.commit()
+        return status
+
+    def counts(self):
+        """Number of deliveries per status"""
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM deliveries GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+    def purge(self, retention=DEFAULT_RETENTION, now=None):
+        """
+        Delete deliveries sent (or given up on) more than retention seconds
+        ago, then every stored file no remaining delivery refers to.
+
+        Returns:
+            tuple: (deliveries deleted, files deleted)
+        """
+        now = time.time() if now is None else now
+        cutoff = now - retention
+        cursor = self.conn.execute(
+            "DELETE FROM deliveries WHERE (status = 'sent' AND sent_at < ?) OR (status = 'failed' AND created_at < ?)",
+            (cutoff, cutoff))
+        self.conn.commit()
+
+        referenced = set()
+        for row in self.conn.execute("SELECT method, payload FROM deliveries"):
+            args = json.loads(row['payload'])
+            for index in OUTBOX_METHODS.get(row['method'], []):
+                paths = args[index] if isinstance(args[index], list) else [args[index]]
+                referenced.update(os.path.basename(path) for path in paths)
+
+        removed_files = 0
+        try:
+            names = os.listdir(self.files_dir)
+        except OSError:
+            names = []
+        for name in names:
+            path = os.path.join(self.files_dir, name)
+            try:
+                if name in referenced or now - os.path.getmtime(path) < FILE_GRACE:
+                    continue
+                os.remove(path)
+                removed_files += 1
+            except OSError:
+                continue
+        return cursor.rowcount, removed_files
+
+    def drain(self, bot_token, ids=None, retention=DEFAULT_RETENTION, skip_scope=None, **retry_options):
+        """
+        Attempt every due delivery once. A full drain (ids None) then purges
+        finished deliveries older than retention.
+
+        skip_scope leaves deliveries of that scope to whoever queues them:
+        a drain running alongside send() for the same scope would otherwise
+        claim its delivery and make send() report a failure.
+
+        Returns:
+            dict: Number of deliveries 'sent', 'retrying' and 'failed'.
+        """
+        client = get_client(bot_token)
+        summary = {'sent': 0, 'retrying': 0, 'failed': 0}
+
+        for row in self.due(ids, skip_scope=skip_scope):
+            if not self.claim(row['id']):
+                continue
+            args = json.loads(row['payload'])
+            try:
+                response = getattr(client, row['method'])(row['chat_id'], *args)
+                # send_media_group returns one response per request
+                ok = all(response) if isinstance(response, list) else bool(response)
+                error = None if ok else "Telegram request failed"
+            except Exception as e:
+                ok = False
+                error = e
+
+            if ok:
+                self.mark_sent(row['id'])
+                summary['sent'] += 1
+            elif self.mark_failed(row['id'], error, **retry_options) == 'failed':
+                logger.error("Giving up on delivery %s (%s): %s", row['id'], row['method'], error)
+                summary['failed'] += 1
+            else:
+                summary['retrying'] += 1
+
+        if ids is None:
+            self.purge(retention)
+        return summary
+
+    def send(self, bot_token, chat_id, method, *args, scope="", key=None):
+        """
+        Queue a delivery and attempt it straight away. If the attempt fails it
+        stays in the outbox for a later drain.
+
+        Returns:
+            bool: True if the delivery has been sent (now or previously).
+        """
+        delivery_id, is_new = self.enqueue(chat_id, method, *args, scope=scope, key=key)
+        if not is_new:
+            status = self.conn.execute("SELECT status FROM deliveries WHERE id = ?", (delivery_id,)).fetchone()
+            if status['status'] == 'sent':
+                logger.info("Delivery %s was already sent, skipping", delivery_id)
+                return True
+
+        self.drain(bot_token, ids=[delivery_id])
+        status = self.conn.execute("SELECT status FROM deliveries WHERE id = ?", (delivery_id,)).fetchone()
+        return status['status'] == 'sent'
+
+
+def run_worker(bot_token, path=OUTBOX_PATH, poll_interval=30.0, once=False):
+    """
+    Drain due deliveries once (once=True) or keep polling forever
+    """
+    outbox = Outbox(path)
+    try:
+        while True:
+            summary = outbox.drain(bot_token)
+            if any(summary.values()):
+                logger.info("Outbox drain: %s", summary)
+            if once:
+                pending = outbox.counts().get('pending', 0)
+                logger.log(logging.WARNING if pending else logging.INFO, "Outbox: %s deliveries still pending", pending)
+                return pending
+            time.sleep(poll_interval)
+    finally:
+        outbox.close()
+
+
+def main():
+    """
+    Retry pending deliveries without re-running the scrape
+    """
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Drain the Telegram delivery outbox")
+    parser.add_argument('--watch', action='store_true', help="Keep polling instead of exiting when nothing is due")
+    parser.add_argument('--interval', type=float, default=30.0, help="Seconds between drains with --watch")
+    args = parser.parse_args()
+
+    bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
+    if not bot_token:
+        logger.error("TELEGRAM_BOT_TOKEN is not set. Please check your .env file.")
+        return
+
+    run_worker(bot_token, poll_interval=args.interval, once=not args.watch)
+
+
+if __name__ == "__main__":
+    main()
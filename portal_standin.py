@@ -0,0 +1,359 @@
+import collections
+import datetime
+import html
+import os
+import random
+import secrets
+import shutil
+import statistics
+import tempfile
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SIGNON_PATH = '/CSSISSTD/signon.html'
+
+# One week of fixture lessons: (weekday, first hour row, rows spanned, cell)
+FIXTURE_LESSONS = [
+    (0, 1, 2, "INF1001 - ALL|Introduction to Computing|Lecture|9:00AM - 11:00AM|E2-01"),
+    (0, 5, 2, "INF1002 - P1|Programming Fundamentals|Laboratory|1:00PM - 3:00PM|E2-05-12"),
+    (1, 2, 1, "INF1003 - ALL|Computer Systems|Lecture|10:00AM - 11:00AM|E1-02"),
+    (2, 0, 3, "INF1004 - T2|Mathematics I|Tutorial|8:00AM - 11:00AM|E2-03-01"),
+    (3, 6, 2, "INF1001 - T1|Introduction to Computing|Tutorial|2:00PM - 4:00PM|E2-04-04"),
+    (4, 1, 1, "INF1005 - ALL|Communication Skills|Seminar|9:00AM - 10:00AM|E6-01"),
+]
+FIXTURE_HOURS = range(8, 19)
+
+PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{title}</title></head>
+<body>{body}</body></html>"""
+
+
+def fixture_week(start):
+    """Monday of the week containing start, a datetime.date"""
+    return start - datetime.timedelta(days=start.weekday())
+
+
+def render_schedule_table(monday):
+    """
+    WEEKLY_SCHED_HTMLAREA as PeopleSoft renders it: a time column, seven day
+    columns headed "Monday<br>13 Oct", lessons as <br>-separated cells with
+    rowspans
+    """
+    starts = {(day, row): (span, cell) for day, row, span, cell in FIXTURE_LESSONS}
+    covered = set()
+    for day, row, span, _ in FIXTURE_LESSONS:
+        covered.update((day, row + offset) for offset in range(1, span))
+
+    days = [monday + datetime.timedelta(days=day) for day in range(7)]
+    header = ''.join(f"<th>{date:%A}<br>{date.day} {date:%b}</th>" for date in days)
+    rows = [f"<tr><th>Time</th>{header}</tr>"]
+    for row, hour in enumerate(FIXTURE_HOURS):
+        label = datetime.time(hour).strftime('%I:%M%p').lstrip('0')
+        cells = [f"<td>{label}</td>"]
+        for day in range(7):
+            if (day, row) in covered:
+                continue
+            if (day, row) in starts:
+                span, cell = starts[(day, row)]
+                text = '<br>'.join(html.escape(part) for part in cell.split('|'))
+                cells.append(f"<td class='SSSCLASSMEETING' rowspan='{span}'><span>{text}</span></td>")
+            else:
+                cells.append("<td>&nbsp;</td>")
+        rows.append(f"<tr>{''.join(cells)}</tr>")
+    return f"<table id='WEEKLY_SCHED_HTMLAREA' class='PSLEVEL1GRID'>{''.join(rows)}</table>"
+
+
+class PortalState:
+    """
+    Signed-in sessions, injected latency and request statistics shared by
+    all handlers
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.stats = collections.Counter()
+
+    def new_session(self):
+        token = secrets.token_hex(16)
+        with self.lock:
+            self.sessions.add(token)
+        return token
+
+    def signed_in(self, token):
+        with self.lock:
+            return token in self.sessions
+
+    def record(self, path, status):
+        with self.lock:
+            self.stats[f"{path}:{status}"] += 1
+
+    def summary(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+class PortalHandler(BaseHTTPRequestHandler):
+    """
+    The pages get_timetable() walks through, with the element ids of the
+    real portal:
+
+        /CSSISSTD/signon.html   sign-on form
+        /psc/landing            landing page with the grouplet
+        /psc/student-center     page with the weekly schedule component
+        /psc/schedule           page embedding the schedule iframe
+        /psc/schedule-frame     start date, refresh button and the table
+    """
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm holds the body back until the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_page(self, status, title, body, headers=None):
+        content = PAGE.format(title=title, body=body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def redirect(self, location, headers=None):
+        self.send_response(302)
+        self.send_header('Location', location)
+        self.send_header('Content-Length', '0')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+
+    def session_token(self):
+        for part in self.headers.get('Cookie', '').split(';'):
+            name, _, value = part.strip().partition('=')
+            if name == 'PS_TOKEN':
+                return value
+        return None
+
+    def delay(self):
+        delay = self.state.latency + random.uniform(0, self.state.jitter)
+        if delay:
+            time.sleep(delay)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.delay()
+        path = urllib.parse.urlsplit(self.path).path
+        if path != '/CSSISSTD/login':
+            self.state.record(path, 404)
+            self.send_page(404, "Not Found", "<p>Not Found</p>")
+            return
+        # Any credentials are accepted
+        token = self.state.new_session()
+        self.state.record(path, 302)
+        self.redirect('/psc/landing', {'Set-Cookie': f"PS_TOKEN={token}; Path=/; HttpOnly"})
+
+    def do_GET(self):
+        self.delay()
+        url = urllib.parse.urlsplit(self.path)
+        path = url.path
+
+        if path == SIGNON_PATH:
+            self.state.record(path, 200)
+            self.send_page(200, "Sign In", """
+                <form method="post" action="/CSSISSTD/login">
+                  <input id="userNameInput" name="UserName" type="email">
+                  <input id="passwordInput" name="Password" type="password">
+                  <span id="submitButton" role="button" onclick="document.forms[0].submit()">Sign in</span>
+                </form>""")
+            return
+
+        if not path.startswith('/psc/'):
+            self.state.record(path, 404)
+            self.send_page(404, "Not Found", "<p>Not Found</p>")
+            return
+
+        if not self.state.signed_in(self.session_token()):
+            self.state.record(path, 302)
+            self.redirect(SIGNON_PATH)
+            return
+
+        base = f"http://{self.headers.get('Host')}"
+        if path == '/psc/landing':
+            body = """<div id="win0divPTNUI_LAND_REC_GROUPLET$1" style="width:200px;height:100px"
+                           onclick="location.href='/psc/student-center'">Student Center</div>"""
+        elif path == '/psc/student-center':
+            body = """<div id="win0div$ICField$11$$1" style="width:200px;height:40px"
+                           onclick="location.href='/psc/schedule'">My Weekly Schedule</div>"""
+        elif path == '/psc/schedule':
+            body = f"""<iframe id="main_target_win0" src="{base}/psc/schedule-frame"
+                               style="width:1200px;height:900px"></iframe>"""
+        elif path == '/psc/schedule-frame':
+            start = urllib.parse.parse_qs(url.query).get('start', [''])[0]
+            try:
+                start_date = datetime.datetime.strptime(start, "%d/%m/%Y").date()
+            except ValueError:
+                start_date = datetime.date.today()
+            body = f"""<a id="DERIVED_CLASS_S_SSR_DISP_TITLE_LBL" href="#">My Weekly Schedule</a>
+                <form method="get" action="/psc/schedule-frame">
+                  <input id="DERIVED_CLASS_S_START_DT" name="start" value="{start_date:%d/%m/%Y}">
+                  <input id="DERIVED_CLASS_S_SSR_REFRESH_CAL$38$" type="submit" value="Refresh Calendar">
+                </form>
+                {render_schedule_table(fixture_week(start_date))}"""
+        else:
+            self.state.record(path, 404)
+            self.send_page(404, "Not Found", "<p>Not Found</p>")
+            return
+        self.state.record(path, 200)
+        self.send_page(200, "Student Center", body)
+
+
+def start_portal_standin(host='127.0.0.1', port=0, **options):
+    """
+    Start the stand-in portal on a background thread.
+
+    Returns:
+        tuple: (server, state, signon_url). Call server.shutdown() to stop it.
+    """
+    state = PortalState(**options)
+    handler = type('BoundPortalHandler', (PortalHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    signon_url = f"http://{host}:{server.server_address[1]}{SIGNON_PATH}"
+    return server, state, signon_url
+
+
+def measure_cold_start(engine, executable_path, launch, headless=True):
+    """Seconds from launching the browser to a blank page being ready"""
+    from playwright.sync_api import sync_playwright
+    from browser_launch import launch_browser
+
+    with sync_playwright() as p:
+        started = time.monotonic()
+        browser, context = launch_browser(p, launch, headless=headless, engine=engine,
+                                          executable_path=executable_path)
+        try:
+            context.new_page().goto('about:blank')
+            return time.monotonic() - started
+        finally:
+            browser.close()
+
+
+def run_engine_benchmark(engines=None, runs=3, launch_profile=None, headless=True, **options):
+    """
+    Run the full get_timetable() flow against a fresh stand-in portal with
+    each engine and report cold start time, total run time and peak memory
+    (medians of cold start and total, maxima of memory).
+
+    engines are BROWSER_ENGINES names, optionally with a browser executable
+    as "name=/path/to/browser". Every engine sees the same random pauses, so
+    totals differ only by the browser. Nothing is written to the real
+    timetable CSV, fetch checkpoints or the step latency history.
+    """
+    from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+    from browser_launch import BROWSER_ENGINES, MemoryMonitor, get_browser_engine, get_launch_profile
+    from fetch_checkpoint import FetchCheckpoint
+    from step_timeouts import TimeoutPolicy
+    from timetableFinder import get_timetable
+
+    launch = get_launch_profile(launch_profile)
+    server, state, signon_url = start_portal_standin(**options)
+    output_dir = tempfile.mkdtemp(prefix='portal-benchmark-')
+    checkpoint_dir = os.path.join(output_dir, 'checkpoints')
+    reports = {}
+    try:
+        for spec in engines or list(BROWSER_ENGINES):
+            name, _, executable_path = spec.partition('=')
+            engine = get_browser_engine(name)
+            report = {'runs': 0, 'ok': 0, 'cold_start': [], 'total': [],
+                      'browser_mib': 0.0, 'python_mib': 0.0, 'error': None}
+            reports[spec] = report
+            for run in range(runs):
+                FetchCheckpoint('benchmark', checkpoint_dir=checkpoint_dir).clear()
+                random.seed(run)
+                report['runs'] += 1
+                try:
+                    report['cold_start'].append(measure_cold_start(engine, executable_path or None, launch, headless))
+                    started = time.monotonic()
+                    with MemoryMonitor() as memory:
+                        df = get_timetable('benchmark', 'benchmark', headless=headless,
+                                           launch_profile=launch_profile, attempts=1, extraction='dom',
+                                           debug_artifacts='off', browser_engine=name,
+                                           browser_executable=executable_path or None, signon_url=signon_url,
+                                           csv_path=os.path.join(output_dir, 'timetable.csv'),
+                                           checkpoint_dir=checkpoint_dir,
+                                           timeouts=TimeoutPolicy(history_path=None,
+                                                                  timeout_errors=(PlaywrightTimeoutError,)))
+                    report['total'].append(time.monotonic() - started)
+                except Exception as e:
+                    report['error'] = str(e).splitlines()[0]
+                    print(f"{spec}: run {run + 1} failed: {report['error']}")
+                    break
+                peak = memory.report()
+                report['browser_mib'] = max(report['browser_mib'], peak['browser_mib'])
+                report['python_mib'] = max(report['python_mib'], peak['python_mib'])
+                if df is not None and not df.empty:
+                    report['ok'] += 1
+    finally:
+        server.shutdown()
+        shutil.rmtree(output_dir, ignore_errors=True)
+
+    print(f"{'engine':<36} {'ok':>5} {'cold start':>11} {'total':>9} {'browser':>10} {'python':>9}")
+    for spec, report in reports.items():
+        if not report['total']:
+            print(f"{spec:<36} {report['ok']:>2}/{report['runs']:<2} failed: {report['error']}")
+            continue
+        print(f"{spec:<36} {report['ok']:>2}/{report['runs']:<2} "
+              f"{statistics.median(report['cold_start']):>10.2f}s {statistics.median(report['total']):>8.2f}s "
+              f"{report['browser_mib']:>6.1f} MiB {report['python_mib']:>5.1f} MiB")
+    print(f"Portal requests: {sum(state.summary().values())}")
+    return reports
+
+
+def main():
+    """
+    Run the stand-in portal, or the engine benchmark with --benchmark
+    """
+    import argparse
+
+    from browser_launch import LAUNCH_PROFILES
+
+    parser = argparse.ArgumentParser(description="Local stand-in for the SIT student portal")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8090)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument('--benchmark', nargs='*', metavar='ENGINE',
+                        help="Benchmark these browser engines (name or name=/path/to/browser; "
+                             "default: all of them) and exit")
+    parser.add_argument('--runs', type=int, default=3, help="Benchmark runs per engine")
+    parser.add_argument('--launch-profile', choices=list(LAUNCH_PROFILES), help="Launch profile for the benchmark")
+    parser.add_argument('--headed', action='store_true', help="Show the browser during the benchmark")
+    args = parser.parse_args()
+
+    options = {'latency': args.latency, 'jitter': args.jitter}
+
+    if args.benchmark is not None:
+        run_engine_benchmark(args.benchmark, args.runs, args.launch_profile, not args.headed, **options)
+        return
+
+    server, state, signon_url = start_portal_standin(args.host, args.port, **options)
+    print(f"Portal stand-in listening on {signon_url} (pass it to get_timetable(signon_url=...))")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"Stats: {state.summary()}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+import contextlib
+import cProfile
+import datetime
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Get the directory where this script is located
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILES_DIR = os.path.join(SCRIPT_DIR, "profiles")
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ('deterministic', 'sampling')
+
+_current_session = None
+
+
+def current_session():
+    """The active ProfileSession, or None when profiling is off"""
+    return _current_session
+
+
+def profile_mode(profile):
+    """
+    Normalise a profile switch value: True means "deterministic", a mode
+    name is passed through, anything falsy means off (None)
+    """
+    if not profile:
+        return None
+    if profile is True:
+        return 'deterministic'
+    if profile not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode {profile!r}, expected one of {PROFILE_MODES}")
+    return profile
+
+
+def profile_stage(name):
+    """
+    Context manager marking a hot stage. A no-op unless a ProfileSession is
+    active, so it can stay in library code permanently.
+    """
+    if _current_session is None:
+        return contextlib.nullcontext()
+    return _current_session.stage(name)
+
+
+class ProfileSession:
+    """
+    Profiles the stages of one run and writes the artifacts to
+    profiles/<run id>/:
+
+        summary.txt      stage timings, peak memory, top-N hot functions and
+                         top allocation sites
+        <stage>.prof     cProfile data per stage (deterministic mode)
+        samples.folded   folded stacks for flame graphs (sampling mode)
+
+    Deterministic mode runs cProfile inside each stage; sampling mode
+    snapshots every thread's stack each sample_interval seconds. Stages may
+    run on several threads at once (main.py overlaps its stages), so stage
+    nesting is tracked per thread. Allocations are tracked with tracemalloc
+    in both modes. tracemalloc only counts the whole process, so stages
+    that overlap others (nested or on other threads) are flagged as shared
+    and report the process-wide peak since the first of them started.
+    """
+
+    def __init__(self, mode='deterministic', label='run', output_dir=None, top_n=25,
+                 sample_interval=0.005, trace_memory=True):
+        self.mode = profile_mode(mode)
+        self.label = label
+        self.run_id = f"{label}-{datetime.datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+        self.output_dir = output_dir or os.path.join(PROFILES_DIR, self.run_id)
+        self.top_n = top_n
+        self.sample_interval = sample_interval
+        self.trace_memory = trace_memory
+
+        self.stages = []
+        self.stage_stacks = {}
+        self.active_stages = []
+        self.stage_lock = threading.Lock()
+        self.profilers = {}
+        self.samples = Counter()
+        self.sampler = None
+        self.sampling = threading.Event()
+        self.started = None
+        self.peak_memory = 0
+
+    def __enter__(self):
+        global _current_session
+        if _current_session is not None:
+            raise RuntimeError("A profile session is already active")
+        _current_session = self
+        self.started = time.perf_counter()
+
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        if self.mode == 'sampling':
+            self.sampling.set()
+            self.sampler = threading.Thread(target=self._sample, daemon=True)
+            self.sampler.start()
+        logger.info("Profiling enabled (%s), run id %s", self.mode, self.run_id)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _current_session
+        elapsed = time.perf_counter() - self.started
+        if self.sampler is not None:
+            self.sampling.clear()
+            self.sampler.join()
+
+        snapshot = None
+        if tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            snapshot = tracemalloc.take_snapshot()
+            if self.trace_memory:
+                tracemalloc.stop()
+
+        _current_session = None
+        try:
+            self._write_artifacts(elapsed, snapshot, failed=exc_type is not None)
+        except OSError as e:
+            logger.warning("Could not write profile artifacts: %s", e)
+        return False
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Time (and in deterministic mode, cProfile) one stage"""
+        stage_stack = self.stage_stacks.setdefault(threading.get_ident(), [])
+        record = {'name': name, 'depth': len(stage_stack), 'wall': 0.0,
+                  'memory_delta': 0, 'memory_peak': 0, 'shared': False}
+        stage_stack.append(name)
+
+        # cProfile cannot nest, so inner stages are attributed to the outer one
+        profiler = None
+        if self.mode == 'deterministic' and record['depth'] == 0:
+            profiler = self.profilers.setdefault(name, cProfile.Profile())
+
+        memory_before = 0
+        with self.stage_lock:
+            self.stages.append(record)
+            if self.active_stages:
+                # Resetting the peak now would erase theirs
+                for other in self.active_stages:
+                    other['shared'] = True
+                record['shared'] = True
+            if tracemalloc.is_tracing():
+                memory_before, peak = tracemalloc.get_traced_memory()
+                self.peak_memory = max(self.peak_memory, peak)
+                if not self.active_stages:
+                    tracemalloc.reset_peak()
+            self.active_stages.append(record)
+
+        started = time.perf_counter()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:
+                # Python 3.12+ allows one active profiler per process, so a
+                # stage overlapping another thread's stage is only timed
+                profiler = None
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            record['wall'] = time.perf_counter() - started
+            with self.stage_lock:
+                if tracemalloc.is_tracing():
+                    memory_after, peak = tracemalloc.get_traced_memory()
+                    record['memory_delta'] = memory_after - memory_before
+                    record['memory_peak'] = peak
+                    self.peak_memory = max(self.peak_memory, peak)
+                self.active_stages.remove(record)
+            stage_stack.pop()
+
+    def _sample(self):
+        """Sampler thread: record every other thread's stack as folded frames"""
+        own_id = threading.get_ident()
+        while self.sampling.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stage_stack = self.stage_stacks.get(thread_id)
+                stage = stage_stack[-1] if stage_stack else '<no stage>'
+                self.samples[';'.join([stage] + stack[::-1])] += 1
+            time.sleep(self.sample_interval)
+
+    def _write_artifacts(self, elapsed, snapshot, failed):
+        os.makedirs(self.output_dir, exist_ok=True)
+        out = io.StringIO()
+        out.write(f"Profile {self.run_id} ({self.mode}){' - run failed' if failed else ''}\n")
+        out.write(f"Total wall time: {elapsed:.3f}s\n")
+        out.write(f"Peak traced Python memory: {self.peak_memory / 1024 / 1024:.1f} MiB\n")
+        if resource is not None:
+            # ru_maxrss is in KiB on Linux and bytes on macOS
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            max_rss = max_rss / 1024 / 1024 if sys.platform == 'darwin' else max_rss / 1024
+            out.write(f"Peak process RSS: {max_rss:.1f} MiB\n")
+        out.write("\n")
+
+        out.write("Stages:\n")
+        for record in self.stages:
+            indent = '  ' * (record['depth'] + 1)
+            out.write(f"{indent}{record['name']:<32} {record['wall']:8.3f}s  "
+                      f"peak {record['memory_peak'] / 1024 / 1024:7.1f} MiB  "
+                      f"delta {record['memory_delta'] / 1024 / 1024:+7.1f} MiB"
+                      f"{'  *' if record['shared'] else ''}\n")
+        if any(record['shared'] for record in self.stages):
+            out.write("  * overlapped other stages: peak and delta are process-wide, "
+                      "not this stage's own\n")
+
+        if self.profilers:
+            combined = None
+            for name, profiler in self.profilers.items():
+                profiler.dump_stats(os.path.join(self.output_dir, f"{name}.prof"))
+                if combined is None:
+                    combined = pstats.Stats(profiler, stream=out)
+                else:
+                    combined.add(profiler)
+            out.write(f"\nTop {self.top_n} functions by own time:\n")
+            combined.sort_stats('tottime').print_stats(self.top_n)
+
+        if self.samples:
+            with open(os.path.join(self.output_dir, "samples.folded"), 'w', encoding='utf-8') as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            leaf_counts = Counter()
+            for stack, count in self.samples.items():
+                leaf_counts[stack.rsplit(';', 1)[-1]] += count
+            total = sum(leaf_counts.values())
+            out.write(f"\nTop {self.top_n} functions by samples ({total} samples):\n")
+            for leaf, count in leaf_counts.most_common(self.top_n):
+                out.write(f"  {count:6d}  {count / total:6.1%}  {leaf}\n")
+
+        if snapshot is not None:
+            out.write(f"\nTop {self.top_n} allocation sites:\n")
+            for stat in snapshot.statistics('lineno')[:self.top_n]:
+                out.write(f"  {stat}\n")
+
+        summary = out.getvalue()
+        with open(os.path.join(self.output_dir, "summary.txt"), 'w', encoding='utf-8') as f:
+            f.write(summary)
+
+        # Short version in the log
+        logger.info("Profile written to %s", self.output_dir)
+        for record in self.stages:
+            if record['depth'] == 0:
+                logger.info("  %s: %.3fs, peak %.1f MiB%s", record['name'], record['wall'],
+                            record['memory_peak'] / 1024 / 1024,
+                            ' (process-wide, overlapped other stages)' if record['shared'] else '')
@@ -0,0 +1,122 @@
+import collections
+import logging
+import os
+import re
+import sys
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Quiet by default: only problems reach the console. Everything down to
+# DEBUG is kept in memory and written out only if the run fails.
+DEFAULT_LOG_LEVEL = 'WARNING'
+RING_BUFFER_SIZE = 5000
+
+# Bot API URLs carry the bot token: https://api.telegram.org/bot<token>/method
+BOT_TOKEN_PATTERN = re.compile(r'/bot[^/\s]+/')
+
+logger = logging.getLogger(__name__)
+
+
+class Lazy:
+    """
+    Defers building an expensive log value until a record is formatted:
+
+        logger.debug("Table:\\n%s", Lazy(df.to_string, index=False))
+
+    Nothing is computed for records no handler ever formats.
+    """
+
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+
+    def __str__(self):
+        return str(self.func(*self.args, **self.kwargs))
+
+
+class RedactingFormatter(logging.Formatter):
+    """
+    Masks bot tokens in formatted records, including exception text such
+    as a requests ConnectionError that quotes the request URL
+    """
+
+    def format(self, record):
+        return BOT_TOKEN_PATTERN.sub('/bot<redacted>/', super().format(record))
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Keeps the last capacity records unformatted; they are only formatted
+    when dumped
+    """
+
+    def __init__(self, capacity=RING_BUFFER_SIZE):
+        super().__init__(logging.DEBUG)
+        self.records = collections.deque(maxlen=capacity)
+
+    def emit(self, record):
+        self.records.append(record)
+
+    def dump(self, stream):
+        for record in list(self.records):
+            try:
+                stream.write(self.format(record) + "\n")
+            except Exception:
+                self.handleError(record)
+        stream.flush()
+
+    def clear(self):
+        self.records.clear()
+
+
+ring_buffer = RingBufferHandler()
+ring_buffer.setFormatter(RedactingFormatter(LOG_FORMAT))
+_console = None
+
+
+def configure_logging(level=None):
+    """
+    Send records at level (default: TIMETABLE_LOG_LEVEL or WARNING) to
+    stderr and every record to the ring buffer. Uncaught exceptions dump the
+    ring buffer. Safe to call more than once.
+    """
+    global _console
+    level = (level or os.getenv('TIMETABLE_LOG_LEVEL') or DEFAULT_LOG_LEVEL).upper()
+
+    root = logging.getLogger()
+    root.setLevel(logging.DEBUG)
+    if _console is None:
+        _console = logging.StreamHandler()
+        _console.setFormatter(RedactingFormatter(LOG_FORMAT))
+        root.addHandler(_console)
+        root.addHandler(ring_buffer)
+        sys.excepthook = _dump_on_crash
+    _console.setLevel(level)
+
+    # PIL logs every PNG chunk at DEBUG, which would crowd out our records
+    logging.getLogger('PIL').setLevel(logging.INFO)
+    # urllib3 logs every request line at DEBUG, bot token included
+    logging.getLogger('urllib3').setLevel(logging.WARNING)
+    logging.getLogger('requests').setLevel(logging.WARNING)
+
+
+def dump_recent_logs(reason, stream=None):
+    """
+    Write the buffered records of this run (all levels) after a failure,
+    then empty the buffer
+    """
+    stream = stream or sys.stderr
+    logger.error("%s, recent log records follow", reason)
+    stream.write(f"----- last {len(ring_buffer.records)} log records -----\n")
+    ring_buffer.dump(stream)
+    stream.write("----- end of log records -----\n")
+    ring_buffer.clear()
+
+
+def _dump_on_crash(exc_type, exc, tb):
+    if issubclass(exc_type, KeyboardInterrupt):
+        sys.__excepthook__(exc_type, exc, tb)
+        return
+    logger.critical("Unhandled exception", exc_info=(exc_type, exc, tb))
+    dump_recent_logs("Run crashed")
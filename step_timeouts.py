@@ -0,0 +1,198 @@
+import contextlib
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+# Get the directory where this script is located
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+LATENCY_HISTORY_PATH = os.path.join(SCRIPT_DIR, "step_latency.json")
+
+logger = logging.getLogger(__name__)
+
+# Fixed timeouts (ms) the fetch used before deadlines were learned. They stay
+# the upper bound: a learned deadline is never looser than these.
+STEP_TIMEOUTS = {
+    'signon': 30000,
+    'incapsula': 60000,
+    'signon_idle': 30000,
+    'login_form': 10000,
+    'submit_button': 10000,
+    'login_redirect': 30000,
+    'landing_idle': 10000,
+    'landing_grouplet': 15000,
+    'landing_click_idle': 10000,
+    'schedule_idle': 10000,
+    'schedule_component': 15000,
+    'schedule_click_idle': 10000,
+    'iframe_idle': 10000,
+    'iframe_load': 30000,
+    'title_label': 10000,
+    'title_idle': 5000,
+    'start_date': 10000,
+    'refresh_button': 10000,
+    'refresh_idle': 5000,
+}
+
+
+class FetchError(Exception):
+    """
+    A classified get_timetable() failure. kind says what went wrong
+    ("timeout", "blocked", ...) and step where.
+    """
+    kind = 'error'
+
+    def __init__(self, step, message):
+        super().__init__(message)
+        self.step = step
+
+    def __str__(self):
+        return f"[{self.kind}] step {self.step}: {super().__str__()}"
+
+
+class StepTimeoutError(FetchError):
+    """A step overran its deadline"""
+    kind = 'timeout'
+
+
+class AccessBlockedError(FetchError):
+    """The portal's bot protection did not let the browser through"""
+    kind = 'blocked'
+
+
+class PageNotFoundError(FetchError):
+    """An element the flow needs is not on the page"""
+    kind = 'not_found'
+
+
+class SessionExpiredError(FetchError):
+    """A resumed session was sent back to the sign-on page"""
+    kind = 'session_expired'
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a non-empty list"""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+class TimeoutPolicy:
+    """
+    Per-step deadlines learned from the latencies of earlier runs.
+
+    Once a step has min_samples successful observations, its deadline is the
+    chosen percentile of the last window latencies times margin, clamped
+    between floor_ms and the step's fixed timeout in STEP_TIMEOUTS. Until
+    then, and whenever fixed is set (get_timetable() sets it for retries),
+    the fixed timeout is used.
+
+    A required step that overruns is recorded at the time it waited, as a
+    censored sample: the real latency was at least that long. If the
+    portal becomes slower than the learned deadline, these samples push the
+    percentile up and the deadline widens towards the fixed timeout, instead
+    of staying too tight for good. Optional waits that do not settle are not
+    recorded. With history_path None nothing is loaded or saved (for test
+    runs against a stand-in).
+    """
+
+    def __init__(self, history_path=LATENCY_HISTORY_PATH, defaults=None, fraction=0.95, margin=1.5,
+                 floor_ms=2000, min_samples=5, window=50, timeout_errors=(TimeoutError,)):
+        self.history_path = history_path
+        self.defaults = defaults or STEP_TIMEOUTS
+        self.fraction = fraction
+        self.margin = margin
+        self.floor_ms = floor_ms
+        self.min_samples = min_samples
+        self.window = window
+        self.timeout_errors = timeout_errors
+        self.fixed = False
+        self.lock = threading.Lock()
+        self.history = self.load()
+        self.new_samples = {}
+
+    def load(self):
+        if self.history_path is None:
+            return {}
+        try:
+            with open(self.history_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def timeout(self, step):
+        """Deadline in ms for a step"""
+        default = self.defaults[step]
+        samples = self.history.get(step, [])
+        if self.fixed or len(samples) < self.min_samples:
+            return default
+        learned = percentile(samples[-self.window:], self.fraction) * self.margin
+        return int(min(default, max(self.floor_ms, learned)))
+
+    def record(self, step, elapsed_ms):
+        with self.lock:
+            self.history.setdefault(step, []).append(round(elapsed_ms))
+            self.history[step] = self.history[step][-self.window:]
+            self.new_samples.setdefault(step, []).append(round(elapsed_ms))
+
+    @contextlib.contextmanager
+    def step(self, name, required=True, error=StepTimeoutError):
+        """
+        Run one wait under the step's deadline; yields the timeout in ms to
+        pass to Playwright. A timeout raises error (a FetchError) for required
+        steps and is ignored for optional ones, such as waiting for the
+        network to settle after a click.
+        """
+        timeout = self.timeout(name)
+        started = time.monotonic()
+        try:
+            yield timeout
+        except self.timeout_errors as e:
+            elapsed = (time.monotonic() - started) * 1000
+            if required:
+                self.record(name, elapsed)
+                raise error(name, f"no progress after {elapsed:.0f}ms (deadline {timeout}ms)") from e
+            logger.debug("Step %s did not settle within %sms, continuing", name, timeout)
+            return
+        self.record(name, (time.monotonic() - started) * 1000)
+
+    def save(self):
+        """
+        Merge this run's samples into the history file. Other runs may have
+        written it meanwhile, so the file is re-read before writing.
+        """
+        with self.lock:
+            if not self.new_samples or self.history_path is None:
+                return
+            history = self.load()
+            for step, samples in self.new_samples.items():
+                history[step] = (history.get(step, []) + samples)[-self.window:]
+            self.new_samples = {}
+            self.history = history
+        temp_path = self.history_path + '.tmp'
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(history, f)
+            os.replace(temp_path, self.history_path)
+        except OSError as e:
+            logger.warning("Could not save step latency history: %s", e)
+
+    def summary(self):
+        """Current deadline per step, for diagnostics"""
+        return {step: self.timeout(step) for step in self.defaults}
+
+
+def main():
+    """
+    Show the learned deadline for every step
+    """
+    policy = TimeoutPolicy()
+    for step, timeout in policy.summary().items():
+        samples = policy.history.get(step, [])
+        learned = "learned" if len(samples) >= policy.min_samples else "fixed"
+        print(f"{step:<20} {timeout:>6}ms  ({learned}, {len(samples)} samples)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,590 @@
 import requests
+from requests.adapters import HTTPAdapter
+import hashlib
+import json
+import logging
 import os
+import random
+import threading
+import time
+
+# Default Bot API base URL. Set the TELEGRAM_API_BASE environment variable (or
+# pass api_base to TelegramClient) to use a local stand-in such as
+# telegram_standin.py instead.
+TELEGRAM_API_BASE = "https://api.telegram.org"
+
+# Get the directory where this script is located
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+MEDIA_CACHE_PATH = os.path.join(SCRIPT_DIR, "telegram_media_cache.json")
+
+logger = logging.getLogger(__name__)
+
+# Responses worth retrying besides 429 (which carries its own retry_after)
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+# Bot API limits: text length in UTF-16 code units, and items per media group
+TELEGRAM_MESSAGE_LIMIT = 4096
+MEDIA_GROUP_LIMIT = 10
+MEDIA_METHODS = {'photo': 'sendPhoto', 'document': 'sendDocument'}
+
+
+class MediaCache:
+    """
+    Maps content hashes of uploaded files to the file_id Telegram returned,
+    so identical content can be re-sent without another upload.
+
+    Entries are persisted as JSON at `path` (None keeps them in memory only).
+    """
+
+    def __init__(self, path=MEDIA_CACHE_PATH):
+        self.path = path
+        self.entries = {}
+        self.lock = threading.Lock()
+        self.key_locks = {}
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring unreadable media cache %s: %s", path, e)
+
+    @staticmethod
+    def make_key(bot_token, kind, content):
+        """Cache key for some content; file_ids are only valid per bot and media kind"""
+        bot_id = bot_token.split(':')[0]
+        return f"{bot_id}:{kind}:{hashlib.sha256(content).hexdigest()}"
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def key_lock(self, key):
+        """Lock held while uploading `key`, so concurrent sends upload it once"""
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+
+    def set(self, key, file_id):
+        with self.lock:
+            self.entries[key] = file_id
+            self._save()
+
+    def discard(self, key):
+        with self.lock:
+            if self.entries.pop(key, None) is not None:
+                self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self.entries, f)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logger.warning("Could not save media cache: %s", e)
+
+
+_default_media_cache = None
+
+
+def get_media_cache():
+    """
+    Return the shared on-disk MediaCache, loading it on first use
+    """
+    global _default_media_cache
+    if _default_media_cache is None:
+        _default_media_cache = MediaCache()
+    return _default_media_cache
+
+
+def extract_file_id(response, kind):
+    """
+    Pull the file_id out of a sendPhoto/sendDocument response
+    """
+    result = (response or {}).get('result') or {}
+    if kind == 'photo':
+        sizes = result.get('photo') or []
+        # All sizes belong to the same upload; the largest is the original
+        return sizes[-1]['file_id'] if sizes else None
+    media = result.get(kind) or {}
+    return media.get('file_id')
+
+
+def rejects_file_id(response):
+    """
+    Whether an error response from call(..., return_errors=True) says the
+    file_id itself is no longer valid, as opposed to any other failure
+    """
+    if not response or response.get('ok') or response.get('error_code') != 400:
+        return False
+    description = (response.get('description') or '').lower()
+    return 'file identifier' in description or 'file reference' in description
+
+
+def telegram_length(text):
+    """
+    Length of text as Telegram counts it (UTF-16 code units)
+    """
+    return len(text.encode('utf-16-le')) // 2
+
+
+def split_oversized_block(block, limit):
+    """
+    Split a single block that does not fit in one message, on line breaks
+    where possible and on characters otherwise
+    """
+    # A character outside the BMP takes two UTF-16 code units
+    if limit < 2:
+        raise ValueError(f"Message limit must be at least 2, got {limit}")
+    pieces = []
+    current = []
+    current_length = 0
+    for line in block.split("\n"):
+        while telegram_length(line) > limit:
+            # Very long line: cut it down to size
+            cut = limit
+            while telegram_length(line[:cut]) > limit:
+                cut -= 1
+            if current:
+                pieces.append("\n".join(current))
+                current, current_length = [], 0
+            pieces.append(line[:cut])
+            line = line[cut:]
+        added = telegram_length(line) + (1 if current else 0)
+        if current and current_length + added > limit:
+            pieces.append("\n".join(current))
+            current, current_length = [], 0
+            added = telegram_length(line)
+        current.append(line)
+        current_length += added
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def chunk_blocks(blocks, limit=TELEGRAM_MESSAGE_LIMIT, separator="\n\n"):
+    """
+    Pack text blocks (e.g. one per lesson) into as few messages as possible
+    without splitting a block, unless a single block exceeds the limit.
+
+    Returns:
+        list: Message texts, each at most `limit` UTF-16 code units.
+    """
+    if limit < 2:
+        raise ValueError(f"Message limit must be at least 2, got {limit}")
+    messages = []
+    current = []
+    current_length = 0
+    separator_length = telegram_length(separator)
+
+    for block in blocks:
+        block_length = telegram_length(block)
+        if block_length > limit:
+            if current:
+                messages.append(separator.join(current))
+                current, current_length = [], 0
+            messages.extend(split_oversized_block(block, limit))
+            continue
+
+        added = block_length + (separator_length if current else 0)
+        if current and current_length + added > limit:
+            messages.append(separator.join(current))
+            current, current_length = [], 0
+            added = block_length
+        current.append(block)
+        current_length += added
+
+    if current:
+        messages.append(separator.join(current))
+    return messages
+
+
+class MessageBuilder:
+    """
+    Builds a message from blocks with a single join instead of repeated
+    string concatenation, and splits it on block boundaries when it is too
+    long for one Telegram message.
+    """
+
+    def __init__(self, header="", separator="\n\n"):
+        self.separator = separator
+        self.blocks = [header] if header else []
+
+    def add(self, *lines):
+        """Add one block made of the given lines"""
+        self.blocks.append("\n".join(str(line) for line in lines))
+        return self
+
+    def build(self):
+        """The whole message as a single string"""
+        return self.separator.join(self.blocks)
+
+    def chunks(self, limit=TELEGRAM_MESSAGE_LIMIT):
+        """The message split into as few Telegram-sized parts as possible"""
+        return chunk_blocks(self.blocks, limit, self.separator)
+
+
+class TelegramClient:
+    """
+    Telegram Bot API client holding a pooled keep-alive session.
+
+    Requests are retried with exponential backoff on connection errors and
+    5xx responses, and after Telegram's retry_after on 429 responses. With a
+    media_cache, photos and documents are uploaded once and re-sent by file_id.
+    """
+
+    def __init__(self, bot_token, connect_timeout=5, read_timeout=30, max_retries=3,
+                 backoff_base=1.0, backoff_max=30.0, pool_size=10, media_cache=None, api_base=None):
+        self.bot_token = bot_token
+        self.api_base = (api_base or os.getenv('TELEGRAM_API_BASE') or TELEGRAM_API_BASE).rstrip('/')
+        self.media_cache = media_cache
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _backoff_delay(self, attempt):
+        """Exponential backoff with jitter for the given retry attempt"""
+        delay = min(self.backoff_max, self.backoff_base * (2 ** attempt))
+        return delay + random.uniform(0, delay / 2)
+
+    def call(self, method, data=None, files=None, read_timeout=None, return_errors=False):
+        """
+        Call a Bot API method, retrying transient failures.
+
+        Args:
+            method (str): API method name, e.g. "sendMessage".
+            data (dict, optional): Form fields.
+            files (dict, optional): Multipart files as {field: (filename, bytes)}.
+                Bytes are used so the upload can be replayed on retry.
+            read_timeout (float, optional): Overrides the client's read
+                timeout, e.g. for long polling.
+            return_errors (bool): Return the decoded error response (with
+                'ok' false, 'error_code' and 'description') when Telegram
+                rejects the request, instead of None.
+
+        Returns:
+            dict: The decoded API response, or None if the call failed.
+        """
+        url = f"{self.api_base}/bot{self.bot_token}/{method}"
+        timeout = (self.timeout[0], read_timeout) if read_timeout else self.timeout
+
+        for attempt in range(self.max_retries + 1):
+            retry_in = None
+            try:
+                response = self.session.post(url, data=data, files=files, timeout=timeout)
+                if response.status_code == 200:
+                    return response.json()
+
+                if response.status_code == 429:
+                    try:
+                        retry_in = response.json().get('parameters', {}).get('retry_after')
+                    except ValueError:
+                        retry_in = None
+                    if retry_in is None:
+                        retry_in = self._backoff_delay(attempt)
+                elif response.status_code in RETRYABLE_STATUS_CODES:
+                    retry_in = self._backoff_delay(attempt)
+                else:
+                    logger.warning("%s failed: %s", method, response.text)
+                    if not return_errors:
+                        return None
+                    try:
+                        return response.json()
+                    except ValueError:
+                        return {'ok': False, 'error_code': response.status_code, 'description': response.text}
+
+                error = f"HTTP {response.status_code}: {response.text}"
+            except (requests.ConnectionError, requests.Timeout) as e:
+                retry_in = self._backoff_delay(attempt)
+                error = e
+
+            if attempt == self.max_retries:
+                logger.error("%s failed after %s attempts: %s", method, attempt + 1, error)
+                return None
+
+            logger.warning("%s attempt %s failed (%s), retrying in %.1fs...", method, attempt + 1, error, retry_in)
+            time.sleep(retry_in)
+
+        return None
+
+    def send_message(self, chat_id, message, parse_mode="HTML"):
+        """
+        Send a text message
+        """
+        data = {
+            "chat_id": chat_id,
+            "text": message,
+            "parse_mode": parse_mode
+        }
+        return self.call("sendMessage", data=data)
+
+    def get_updates(self, offset=None, timeout=25):
+        """
+        Long-poll for new messages sent to the bot
+        """
+        data = {'timeout': timeout, 'allowed_updates': json.dumps(['message'])}
+        if offset is not None:
+            data['offset'] = offset
+        return self.call("getUpdates", data=data, read_timeout=timeout + 10)
+
+    def send_media(self, method, kind, file_path, data):
+        """
+        Send a local file as `kind` ("photo" or "document"), by cached file_id
+        when the same content was uploaded before.
+        """
+        with open(file_path, 'rb') as media:
+            content = media.read()
+        files = {kind: (os.path.basename(file_path), content)}
+
+        if self.media_cache is None:
+            return self.call(method, data=data, files=files)
+
+        key = MediaCache.make_key(self.bot_token, kind, content)
+
+        def send_cached():
+            """The response for the cached file_id, or None if an upload is needed"""
+            file_id = self.media_cache.get(key)
+            if not file_id:
+                return None
+            response = self.call(method, data={**data, kind: file_id}, return_errors=True)
+            if rejects_file_id(response):
+                # The file_id is no longer accepted; upload again
+                self.media_cache.discard(key)
+                return None
+            # Any other failure would hit an upload too; report it as is
+            return response if response and response.get('ok') else False
+
+        response = send_cached()
+        if response is not None:
+            return response or None
+
+        with self.media_cache.key_lock(key):
+            # Another thread may have uploaded it while we waited
+            response = send_cached()
+            if response is not None:
+                return response or None
+
+            response = self.call(method, data=data, files=files)
+            file_id = extract_file_id(response, kind)
+            if file_id:
+                self.media_cache.set(key, file_id)
+            return response
+
+    def send_photo(self, chat_id, photo_path, caption=""):
+        """
+        Send a photo from a local file
+        """
+        data = {
+            'chat_id': chat_id,
+            'caption': caption,
+            'parse_mode': 'HTML'
+        }
+        return self.send_media("sendPhoto", "photo", photo_path, data)
+
+    def send_document(self, chat_id, file_path, caption=""):
+        """
+        Send a document from a local file
+        """
+        data = {'chat_id': chat_id}
+        if caption:
+            data['caption'] = caption
+        return self.send_media("sendDocument", "document", file_path, data)
+
+    def send_long_message(self, chat_id, message, parse_mode="HTML"):
+        """
+        Send text that may exceed Telegram's length limit.
+
+        Args:
+            message (str | list | MessageBuilder): The text, a list of blocks
+                that must not be split, or a builder.
+
+        Returns:
+            list: One API response (or None) per message sent.
+        """
+        if isinstance(message, MessageBuilder):
+            parts = message.chunks()
+        elif isinstance(message, str):
+            parts = chunk_blocks(message.split("\n\n"))
+        else:
+            parts = chunk_blocks(message)
+        return [self.send_message(chat_id, part, parse_mode) for part in parts]
+
+    def send_media_group(self, chat_id, file_paths, kind="photo", caption=""):
+        """
+        Send several local files as albums of up to MEDIA_GROUP_LIMIT items,
+        one sendMediaGroup call per album. Cached file_ids are used in place
+        of uploads where available. The caption goes on the first item.
+
+        Returns:
+            list: One API response (or None) per request made.
+        """
+        responses = []
+        for start in range(0, len(file_paths), MEDIA_GROUP_LIMIT):
+            batch = file_paths[start:start + MEDIA_GROUP_LIMIT]
+            batch_caption = caption if start == 0 else ""
+
+            # sendMediaGroup needs at least two items
+            if len(batch) == 1:
+                data = {'chat_id': chat_id}
+                if batch_caption:
+                    data['caption'] = batch_caption
+                    data['parse_mode'] = 'HTML'
+                responses.append(self.send_media(MEDIA_METHODS[kind], kind, batch[0], data))
+                continue
+
+            responses.append(self._send_media_group_batch(chat_id, batch, kind, batch_caption))
+        return responses
+
+    def _send_media_group_batch(self, chat_id, batch, kind, caption):
+        """Send one album, falling back to full uploads if a cached file_id is rejected"""
+        contents = []
+        for path in batch:
+            with open(path, 'rb') as media:
+                contents.append(media.read())
+        keys = [MediaCache.make_key(self.bot_token, kind, content) if self.media_cache is not None else None
+                for content in contents]
+
+        def build_request(use_cache):
+            media = []
+            files = {}
+            attached = {}
+            for i, (path, content, key) in enumerate(zip(batch, contents, keys)):
+                file_id = self.media_cache.get(key) if use_cache and key else None
+                if file_id:
+                    item = {'type': kind, 'media': file_id}
+                else:
+                    # Identical files in one album are uploaded once
+                    name = attached.get(key) if key else None
+                    if name is None:
+                        name = f"file{i}"
+                        files[name] = (os.path.basename(path), content)
+                        if key:
+                            attached[key] = name
+                    item = {'type': kind, 'media': f"attach://{name}"}
+                if i == 0 and caption:
+                    item['caption'] = caption
+                    item['parse_mode'] = 'HTML'
+                media.append(item)
+            return {'chat_id': chat_id, 'media': json.dumps(media)}, files
+
+        data, files = build_request(use_cache=True)
+        response = self.call("sendMediaGroup", data=data, files=files or None, return_errors=True)
+        if rejects_file_id(response) and len(files) < len(batch):
+            # A cached file_id has expired; the error doesn't say which one,
+            # so upload everything instead
+            for key in keys:
+                self.media_cache.discard(key)
+            data, files = build_request(use_cache=False)
+            response = self.call("sendMediaGroup", data=data, files=files)
+        elif response is not None and not response.get('ok'):
+            response = None
+
+        if response and self.media_cache is not None:
+            for message, key in zip(response.get('result') or [], keys):
+                file_id = extract_file_id({'result': message}, kind)
+                if file_id:
+                    self.media_cache.set(key, file_id)
+        return response
+
+    def close(self):
+        """
+        Close the pooled connections
+        """
+        self.session.close()
+
+
+# One client per bot token so repeated sends in a run reuse warm connections
+_clients = {}
+
+
+def get_client(bot_token):
+    """
+    Return the shared TelegramClient for a bot token, creating it on first use
+    """
+    client = _clients.get(bot_token)
+    if client is None:
+        client = TelegramClient(bot_token, media_cache=get_media_cache())
+        _clients[bot_token] = client
+    return client
+
 
 def send_telegram_message(bot_token, chat_id, message):
     """
     Send a text message via Telegram bot
     """
-    url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-    data = {
-        "chat_id": chat_id,
-        "text": message,
-        "parse_mode": "HTML"
-    }
-    
     try:
-        response = requests.post(url, data=data)
-        if response.status_code == 200:
-            print("Message sent successfully!")
+        if get_client(bot_token).send_message(chat_id, message):
+            logger.info("Message sent successfully!")
             return True
-        else:
-            print(f"Failed to send message: {response.text}")
-            return False
+        logger.error("Failed to send message")
+        return False
     except Exception as e:
-        print(f"Error sending message: {e}")
+        logger.error("Error sending message: %s", e)
         return False
 
 def send_telegram_csv(bot_token, chat_id, csv_file_path):
     """
     Send a CSV file via Telegram bot
     """
-    url = f"https://api.telegram.org/bot{bot_token}/sendDocument"
-    
     try:
-        with open(csv_file_path, 'rb') as file:
-            files = {'document': file}
-            data = {'chat_id': chat_id}
-            
-            response = requests.post(url, data=data, files=files)
-            if response.status_code == 200:
-                print("CSV file sent successfully!")
-                return True
-            else:
-                print(f"Failed to send CSV: {response.text}")
-                return False
+        if get_client(bot_token).send_document(chat_id, csv_file_path):
+            logger.info("CSV file sent successfully!")
+            return True
+        logger.error("Failed to send CSV")
+        return False
     except Exception as e:
-        print(f"Error sending CSV: {e}")
+        logger.error("Error sending CSV: %s", e)
         return False
 
 def send_telegram_photo(bot_token, chat_id, photo_path, caption=""):
     """
     Send a photo via Telegram bot
     """
-    url = f"https://api.telegram.org/bot{bot_token}/sendPhoto"
-    
     try:
-        with open(photo_path, 'rb') as photo:
-            files = {'photo': photo}
-            data = {
-                'chat_id': chat_id,
-                'caption': caption,
-                'parse_mode': 'HTML'
-            }
-            
-            response = requests.post(url, data=data, files=files)
-            if response.status_code == 200:
-                print("Photo sent successfully!")
-                return True
-            else:
-                print(f"Failed to send photo: {response.text}")
-                return False
+        if get_client(bot_token).send_photo(chat_id, photo_path, caption):
+            logger.info("Photo sent successfully!")
+            return True
+        logger.error("Failed to send photo")
+        return False
     except Exception as e:
-        print(f"Error sending photo: {e}")
-        return False
\ No newline at end of file
+        logger.error("Error sending photo: %s", e)
+        return False
+
+def send_telegram_long_message(bot_token, chat_id, message):
+    """
+    Send a text message via Telegram bot, split into as few messages as
+    needed to stay under the length limit
+    """
+    try:
+        responses = get_client(bot_token).send_long_message(chat_id, message)
+        if responses and all(responses):
+            logger.info("Message sent successfully in %s part(s)!", len(responses))
+            return True
+        logger.error("Failed to send message")
+        return False
+    except Exception as e:
+        logger.error("Error sending message: %s", e)
+        return False
+
+def send_telegram_media_group(bot_token, chat_id, file_paths, caption="", kind="photo"):
+    """
+    Send several photos (or documents) via Telegram bot in as few requests
+    as possible
+    """
+    try:
+        responses = get_client(bot_token).send_media_group(chat_id, file_paths, kind, caption)
+        if responses and all(responses):
+            logger.info("%s files sent successfully in %s request(s)!", len(file_paths), len(responses))
+            return True
+        logger.error("Failed to send media group")
+        return False
+    except Exception as e:
+        logger.error("Error sending media group: %s", e)
+        return False
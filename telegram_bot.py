@@ -0,0 +1,261 @@
+import datetime
+import logging
+import os
+import threading
+import time
+
+from run_log import configure_logging, dump_recent_logs
+from telegram import MessageBuilder, get_client
+from timetable_api import TimetableCache
+from timetable_data import module_key, next_working_day
+
+# Get the directory where this script is located
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_IMAGE_PATH = os.path.join(SCRIPT_DIR, "bot_week_image.png")
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_AGE_HOURS = 12
+# Every refresh is a full portal login, so attempts are spaced out even when
+# the last one failed or brought back the same week
+DEFAULT_REFRESH_INTERVAL_MINUTES = 30
+
+HELP_TEXT = """Commands:
+/today - today's lessons
+/tomorrow - tomorrow's lessons
+/week - this week's timetable image
+/module <code> - every lesson of a module this week, e.g. /module INF1001"""
+
+
+class TimetableRefresher:
+    """
+    Re-fetches the timetable from the portal on a background thread, at most
+    one fetch at a time and at most one every min_interval_minutes.
+    get_timetable() rewrites the CSV, which the cache picks up on its next
+    lookup.
+    """
+
+    def __init__(self, username, password, min_interval_minutes=DEFAULT_REFRESH_INTERVAL_MINUTES):
+        self.username = username
+        self.password = password
+        self.min_interval = min_interval_minutes * 60
+        self.last_started = None
+        self.thread = None
+
+    def is_running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def trigger(self):
+        """
+        Start a fetch unless one is running or the last one started less
+        than min_interval ago. Returns True if started.
+        """
+        if self.is_running() or not (self.username and self.password):
+            return False
+        if self.last_started is not None and time.monotonic() - self.last_started < self.min_interval:
+            return False
+        self.last_started = time.monotonic()
+        self.thread = threading.Thread(target=self._fetch, daemon=True)
+        self.thread.start()
+        return True
+
+    def _fetch(self):
+        # Imported here so the bot starts without loading Playwright
+        from timetableFinder import get_timetable
+
+        logger.info("Refreshing timetable in the background...")
+        df = get_timetable(username=self.username, password=self.password, headless=True,
+                           start_date=datetime.datetime.now())
+        if df is None:
+            dump_recent_logs("Background refresh failed")
+        else:
+            logger.info("Background refresh finished")
+
+
+def lessons_message(title, lessons):
+    """
+    Day message in the same layout main.py sends
+    """
+    message = MessageBuilder(title)
+    for lesson in lessons:
+        message.add(lesson["modCode"], lesson["modName"], lesson["modType"], lesson["modTime"], lesson["modRoom"])
+    if not lessons:
+        message.add("No lessons 🎉")
+    return message
+
+
+class TimetableBot:
+    """
+    Answers /today, /tomorrow, /week and /module from the cached timetable.
+
+    Replies never wait for the portal: if the cached data is older than
+    max_age_hours (or lacks a requested day that a refresh would bring
+    back) a background refresh is started and the cached answer is sent
+    straight away. allowed_chats None answers every chat; an empty
+    collection answers none.
+    """
+
+    def __init__(self, bot_token, cache=None, refresher=None, allowed_chats=None,
+                 max_age_hours=DEFAULT_MAX_AGE_HOURS):
+        self.client = get_client(bot_token)
+        self.cache = cache or TimetableCache()
+        self.refresher = refresher
+        self.allowed_chats = {str(chat) for chat in allowed_chats} if allowed_chats is not None else None
+        self.max_age = max_age_hours * 3600
+        self.image_etag = None
+
+    def is_stale(self):
+        return self.cache.mtime is None or time.time() - self.cache.mtime > self.max_age
+
+    def refresh_would_fetch(self, date):
+        """
+        Whether a refresh could add date: the portal returns the week of the
+        next working day, so only dates in that week count, and only if the
+        cache does not hold that week already (weekends are never cached)
+        """
+        week_start = next_working_day(datetime.date.today())
+        week_start -= datetime.timedelta(days=week_start.weekday())
+        week = {week_start + datetime.timedelta(days=day) for day in range(7)}
+        return date in week and not week & set(self.cache.by_date)
+
+    def refresh_if_needed(self, force=False):
+        """Start a background refresh if needed. Returns True if one is running."""
+        if not (force or self.is_stale()) or self.refresher is None:
+            return False
+        if self.refresher.trigger():
+            logger.info("Cached timetable is out of date, refreshing in the background")
+        return self.refresher.is_running()
+
+    def day_reply(self, chat_id, date, label):
+        lessons = self.cache.by_date.get(date)
+        if lessons is None:
+            reply = f"No timetable cached for {date:%a %d %b}."
+            if self.refresh_if_needed(force=self.refresh_would_fetch(date)):
+                reply += " Fetching it now, try again in a few minutes."
+            self.client.send_message(chat_id, reply)
+            return
+        self.client.send_long_message(chat_id, lessons_message(f"{label}'s timetable ({date:%a %d %b}):", lessons))
+
+    def week_reply(self, chat_id):
+        body, etag = self.cache.week_image()
+        if etag != self.image_etag or not os.path.exists(BOT_IMAGE_PATH):
+            with open(BOT_IMAGE_PATH, 'wb') as f:
+                f.write(body)
+            self.image_etag = etag
+        # Unchanged images are re-sent by file_id without uploading
+        self.client.send_photo(chat_id, BOT_IMAGE_PATH, caption="📅 Weekly Timetable")
+
+    def module_reply(self, chat_id, argument):
+        if not argument:
+            self.client.send_message(chat_id, "Usage: /module <code>, e.g. /module INF1001")
+            return
+        code = module_key(argument)
+        lessons = self.cache.module_lessons.get(code)
+        if not lessons:
+            self.client.send_message(chat_id, f"No lessons for {code} in the cached timetable.")
+            return
+        message = MessageBuilder(f"{code} this week:")
+        for lesson in lessons:
+            date = datetime.date.fromisoformat(lesson['date'])
+            message.add(f"{date:%a %d %b}", lesson["modType"], lesson["modTime"], lesson["modRoom"])
+        self.client.send_long_message(chat_id, message)
+
+    def handle(self, message):
+        """Answer one incoming message if it is a known command"""
+        text = (message.get('text') or '').strip()
+        chat_id = (message.get('chat') or {}).get('id')
+        if not text.startswith('/') or chat_id is None:
+            return
+        if self.allowed_chats is not None and str(chat_id) not in self.allowed_chats:
+            return
+
+        command, _, argument = text.partition(' ')
+        # Commands in groups arrive as /today@BotName
+        command = command.split('@')[0].lower()
+
+        if not self.cache.refresh():
+            reply = "No timetable has been fetched yet."
+            if self.refresh_if_needed(force=True):
+                reply += " Fetching it now, try again in a few minutes."
+            self.client.send_message(chat_id, reply)
+            return
+
+        started = time.monotonic()
+        today = datetime.date.today()
+        if command == '/today':
+            self.day_reply(chat_id, today, "Today")
+        elif command == '/tomorrow':
+            self.day_reply(chat_id, today + datetime.timedelta(days=1), "Tomorrow")
+        elif command == '/week':
+            self.week_reply(chat_id)
+        elif command == '/module':
+            self.module_reply(chat_id, argument.strip())
+        elif command in ('/start', '/help'):
+            self.client.send_message(chat_id, HELP_TEXT)
+        else:
+            return
+        logger.info("Answered %s for %s in %.0fms", command, chat_id, (time.monotonic() - started) * 1000)
+
+        self.refresh_if_needed()
+
+    def run(self, poll_timeout=25):
+        """Long-poll Telegram for commands until interrupted"""
+        # Warm the cache so the first reply is fast
+        self.cache.refresh()
+        offset = None
+        logger.info("Bot is listening for commands...")
+        while True:
+            response = self.client.get_updates(offset, poll_timeout)
+            if response is None:
+                time.sleep(5)
+                continue
+            for update in response.get('result', []):
+                offset = update['update_id'] + 1
+                try:
+                    self.handle(update.get('message') or {})
+                except Exception as e:
+                    logger.error("Error handling update %s: %s", update['update_id'], e)
+
+
+def main():
+    """
+    Run the command bot with credentials from the .env file
+    """
+    import argparse
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    configure_logging()
+    parser = argparse.ArgumentParser(description="Answer timetable commands from the cached timetable")
+    parser.add_argument('--max-age', type=float, default=DEFAULT_MAX_AGE_HOURS,
+                        help="Hours after which cached data triggers a background refresh")
+    parser.add_argument('--refresh-interval', type=float, default=DEFAULT_REFRESH_INTERVAL_MINUTES,
+                        help="Minimum minutes between background refreshes")
+    parser.add_argument('--allow-any-chat', action='store_true',
+                        help="Answer every chat, not only TELEGRAM_CHANNEL_ID and TELEGRAM_ALLOWED_CHAT_IDS")
+    args = parser.parse_args()
+
+    bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
+    if not bot_token:
+        logger.error("TELEGRAM_BOT_TOKEN is not set. Please check your .env file.")
+        return
+
+    allowed_chats = None
+    if not args.allow_any_chat:
+        allowed_chats = [os.getenv('TELEGRAM_CHANNEL_ID')] + os.getenv('TELEGRAM_ALLOWED_CHAT_IDS', '').split(',')
+        allowed_chats = [chat.strip() for chat in allowed_chats if chat and chat.strip()]
+        if not allowed_chats:
+            logger.error("No chats to answer. Set TELEGRAM_CHANNEL_ID or TELEGRAM_ALLOWED_CHAT_IDS, "
+                         "or pass --allow-any-chat.")
+            return
+
+    refresher = TimetableRefresher(os.getenv('SIT_USERNAME'), os.getenv('SIT_PASSWORD'), args.refresh_interval)
+    bot = TimetableBot(bot_token, refresher=refresher, allowed_chats=allowed_chats, max_age_hours=args.max_age)
+    try:
+        bot.run()
+    except KeyboardInterrupt:
+        logger.info("Bot stopped")
+
+
+if __name__ == "__main__":
+    main()
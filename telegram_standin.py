@@ -0,0 +1,312 @@
+import collections
+import email.parser
+import email.policy
+import hashlib
+import json
+import random
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SUPPORTED_METHODS = {'sendMessage', 'sendPhoto', 'sendDocument', 'sendMediaGroup'}
+
+
+def parse_form(content_type, body):
+    """
+    Parse a urlencoded or multipart/form-data body.
+
+    Returns:
+        tuple: (fields, files) where fields maps names to strings and files
+        maps names to bytes.
+    """
+    fields = {}
+    files = {}
+    if content_type.startswith('multipart/form-data'):
+        message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            b'Content-Type: ' + content_type.encode() + b'\r\n\r\n' + body)
+        for part in message.iter_parts():
+            name = part.get_param('name', header='content-disposition')
+            payload = part.get_payload(decode=True) or b''
+            if part.get_filename() is not None:
+                files[name] = payload
+            else:
+                fields[name] = payload.decode('utf-8')
+    else:
+        for name, values in urllib.parse.parse_qs(body.decode('utf-8'), keep_blank_values=True).items():
+            fields[name] = values[0]
+    return fields, files
+
+
+class StandinState:
+    """
+    Fault injection settings and request statistics shared by all handlers
+    """
+
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, rate_limit_rate=0.0,
+                 retry_after=1, enforce_limits=False, global_limit=30, per_chat_interval=1.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.enforce_limits = enforce_limits
+        self.global_limit = global_limit
+        self.per_chat_interval = per_chat_interval
+
+        self.lock = threading.Lock()
+        self.message_id = 0
+        self.stats = collections.Counter()
+        self.requests = []
+        self.recent = collections.deque()
+        self.last_by_chat = {}
+
+    def next_message_id(self):
+        with self.lock:
+            self.message_id += 1
+            return self.message_id
+
+    def check_limits(self, chat_id):
+        """Return a retry_after if this request breaks Telegram's real limits"""
+        now = time.monotonic()
+        with self.lock:
+            # Small tolerance for client/server clock and network jitter
+            while self.recent and now - self.recent[0] > 0.9:
+                self.recent.popleft()
+            if len(self.recent) >= self.global_limit:
+                return 1
+            last = self.last_by_chat.get(chat_id)
+            if last is not None and now - last < self.per_chat_interval * 0.9:
+                return max(1, round(self.per_chat_interval))
+            self.recent.append(now)
+            self.last_by_chat[chat_id] = now
+        return None
+
+    def record(self, method, status, chat_id, upload_bytes):
+        with self.lock:
+            self.stats[f"{method}:{status}"] += 1
+            self.stats['upload_bytes'] += upload_bytes
+            self.requests.append({'time': time.monotonic(), 'method': method,
+                                  'status': status, 'chat_id': chat_id})
+
+    def summary(self):
+        with self.lock:
+            return dict(self.stats)
+
+
+def file_id_for(content):
+    """Deterministic fake file_id for uploaded content"""
+    return "standin-" + hashlib.sha256(content).hexdigest()[:32]
+
+
+def media_result(kind, file_id):
+    """Message fields Telegram returns for a sent photo or document"""
+    if kind == 'photo':
+        return {'photo': [{'file_id': file_id + "-thumb", 'width': 90, 'height': 90},
+                          {'file_id': file_id, 'width': 1280, 'height': 1280}]}
+    return {'document': {'file_id': file_id}}
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out in separate writes; without this, Nagle's
+    # algorithm holds the body back until the client's delayed ACK (~40 ms)
+    disable_nagle_algorithm = True
+    state = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        state = self.state
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        method = self.path.rstrip('/').rsplit('/', 1)[-1]
+
+        if method not in SUPPORTED_METHODS:
+            state.record(method, 404, None, len(body))
+            self.send_json(404, {'ok': False, 'error_code': 404, 'description': 'Not Found'})
+            return
+
+        fields, files = parse_form(self.headers.get('Content-Type', ''), body)
+        chat_id = fields.get('chat_id')
+
+        # Limits are judged on arrival, before any injected latency
+        retry_after = state.check_limits(chat_id) if state.enforce_limits else None
+        if retry_after is None and random.random() < state.rate_limit_rate:
+            retry_after = state.retry_after
+
+        delay = state.latency + random.uniform(0, state.jitter)
+        if delay:
+            time.sleep(delay)
+
+        if retry_after is not None:
+            state.record(method, 429, chat_id, len(body))
+            self.send_json(429, {'ok': False, 'error_code': 429,
+                                 'description': f'Too Many Requests: retry after {retry_after}',
+                                 'parameters': {'retry_after': retry_after}})
+            return
+
+        if random.random() < state.error_rate:
+            status = random.choice([500, 502, 503])
+            state.record(method, status, chat_id, len(body))
+            self.send_json(status, {'ok': False, 'error_code': status, 'description': 'Internal Server Error'})
+            return
+
+        if not chat_id:
+            state.record(method, 400, chat_id, len(body))
+            self.send_json(400, {'ok': False, 'error_code': 400, 'description': 'Bad Request: chat_id is empty'})
+            return
+
+        def message(extra):
+            return {'message_id': state.next_message_id(), 'date': int(time.time()),
+                    'chat': {'id': chat_id}, **extra}
+
+        if method == 'sendMessage':
+            result = message({'text': fields.get('text', '')})
+        elif method == 'sendMediaGroup':
+            result = []
+            for item in json.loads(fields.get('media', '[]')):
+                media = item['media']
+                if media.startswith('attach://'):
+                    media = file_id_for(files[media[len('attach://'):]])
+                result.append(message(media_result(item['type'], media)))
+        else:
+            kind = 'photo' if method == 'sendPhoto' else 'document'
+            file_id = file_id_for(files[kind]) if kind in files else fields.get(kind)
+            result = message(media_result(kind, file_id))
+
+        state.record(method, 200, chat_id, len(body))
+        self.send_json(200, {'ok': True, 'result': result})
+
+
+def start_standin(host='127.0.0.1', port=0, **options):
+    """
+    Start the stand-in server on a background thread.
+
+    Returns:
+        tuple: (server, state, base_url). Call server.shutdown() to stop it.
+    """
+    state = StandinState(**options)
+    handler = type('BoundStandinHandler', (StandinHandler,), {'state': state})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://{host}:{server.server_address[1]}"
+    return server, state, base_url
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_delivery_benchmark(messages=100, chats=10, photo_path=None, **options):
+    """
+    Push `messages` text messages (plus one photo per chat if photo_path is
+    given) through DeliveryQueue against a fresh stand-in and report
+    throughput, retries and latency percentiles.
+    """
+    from delivery_queue import DeliveryQueue
+    from telegram import MediaCache, TelegramClient
+
+    server, state, base_url = start_standin(**options)
+    try:
+        client = TelegramClient("0:standin", api_base=base_url, backoff_base=0.2,
+                                media_cache=MediaCache(path=None))
+        queue = DeliveryQueue(client)
+        for i in range(messages):
+            queue.add_message(f"chat{i % chats}", f"Benchmark message {i}")
+        if photo_path:
+            for chat in range(chats):
+                queue.add_photo(f"chat{chat}", photo_path, "Benchmark photo")
+
+        started = time.monotonic()
+        results = queue.deliver()
+        elapsed = time.monotonic() - started
+    finally:
+        server.shutdown()
+
+    latencies = [result['send_time'] for result in results]
+    stats = state.summary()
+    report = {
+        'delivered': sum(1 for result in results if result['ok']),
+        'total': len(results),
+        'elapsed': elapsed,
+        'throughput': len(results) / elapsed if elapsed else 0.0,
+        'requests': sum(count for key, count in stats.items() if ':' in key),
+        'rate_limited': sum(count for key, count in stats.items() if key.endswith(':429')),
+        'server_errors': sum(count for key, count in stats.items() if key.split(':')[-1].startswith('5')),
+        'upload_bytes': stats.get('upload_bytes', 0),
+        'p50': percentile(latencies, 0.50),
+        'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': max(latencies) if latencies else 0.0,
+    }
+
+    print(f"Delivered {report['delivered']}/{report['total']} in {elapsed:.2f}s "
+          f"({report['throughput']:.1f} msg/s)")
+    print(f"Requests: {report['requests']}, 429s: {report['rate_limited']}, "
+          f"5xx: {report['server_errors']}, uploaded: {report['upload_bytes']} bytes")
+    print(f"Send latency p50={report['p50'] * 1000:.0f}ms p95={report['p95'] * 1000:.0f}ms "
+          f"p99={report['p99'] * 1000:.0f}ms max={report['max'] * 1000:.0f}ms")
+    return report
+
+
+def main():
+    """
+    Run the stand-in server, or the delivery benchmark with --benchmark
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Local Telegram Bot API stand-in")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--latency', type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of requests answered with 5xx")
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help="Fraction of requests answered with 429")
+    parser.add_argument('--retry-after', type=int, default=1, help="retry_after sent with injected 429s")
+    parser.add_argument('--enforce-limits', action='store_true',
+                        help="Answer 429 when Telegram's global/per-chat limits are exceeded")
+    parser.add_argument('--benchmark', type=int, metavar='MESSAGES',
+                        help="Run the delivery benchmark with this many messages and exit")
+    parser.add_argument('--chats', type=int, default=10, help="Chats to spread benchmark messages over")
+    parser.add_argument('--photo', help="Also send this photo to every chat in the benchmark")
+    args = parser.parse_args()
+
+    options = {
+        'latency': args.latency,
+        'jitter': args.jitter,
+        'error_rate': args.error_rate,
+        'rate_limit_rate': args.rate_limit_rate,
+        'retry_after': args.retry_after,
+        'enforce_limits': args.enforce_limits,
+    }
+
+    if args.benchmark:
+        run_delivery_benchmark(args.benchmark, args.chats, args.photo, **options)
+        return
+
+    server, state, base_url = start_standin(args.host, args.port, **options)
+    print(f"Telegram stand-in listening on {base_url} (set TELEGRAM_API_BASE to use it)")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"Stats: {state.summary()}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,26 @@
-from playwright.sync_api import sync_playwright
+from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 import time
 import random
 import pandas as pd
 from bs4 import BeautifulSoup
 import datetime
+import logging
 import os
+from profiling import current_session, profile_mode, profile_stage, ProfileSession
+from browser_launch import (MemoryMonitor, default_browser_engine, default_browser_executable, default_launch_profile,
+                            get_browser_engine, get_launch_profile, launch_browser)
+from step_timeouts import AccessBlockedError, FetchError, PageNotFoundError, SessionExpiredError, TimeoutPolicy
+from fetch_checkpoint import CHECKPOINT_DIR, FETCH_STEPS, FetchCheckpoint
+from run_log import Lazy, configure_logging, dump_recent_logs
+from debug_artifacts import ArtifactStore
 
 # Get the directory where this script is located
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+SIGNON_URL = "https://in4sit.singaporetech.edu.sg/CSSISSTD/signon.html"
+
+logger = logging.getLogger(__name__)
+
 def setup_stealth_page(page):
     # Remove webdriver property
     page.add_init_script("""
@@ -48,592 +60,881 @@ def setup_stealth_page(page):
         );
     """)
 
-def get_timetable(username=None, password=None, headless=False, output_filename="weekly_schedule_timetable", start_date=None):
+# Walks the WEEKLY_SCHED_HTMLAREA table inside the page and returns only its
+# cells, as {id, className, rows: [[[text, rowspan], ...], ...]}, or null if
+# the table is missing. Cell text matches table_cells(): text runs between
+# tags are trimmed and joined, and <br> adds "|" to the current run.
+TABLE_GRID_SCRIPT = """
+() => {
+    const table = document.querySelector('table#WEEKLY_SCHED_HTMLAREA')
+        || document.getElementById('WEEKLY_SCHED_HTMLAREA')
+        || document.querySelector('[id*="WEEKLY_SCHED_HTMLAREA"]');
+    if (!table) {
+        return null;
+    }
+    const cellText = (cell) => {
+        const parts = [];
+        let run = '';
+        const flush = () => {
+            const text = run.trim();
+            if (text) {
+                parts.push(text);
+            }
+            run = '';
+        };
+        const walk = (node) => {
+            for (const child of node.childNodes) {
+                if (child.nodeType === Node.TEXT_NODE || child.nodeType === Node.CDATA_SECTION_NODE) {
+                    run += child.data;
+                } else if (child.nodeName === 'BR') {
+                    run += '|';
+                } else {
+                    flush();
+                    if (child.nodeType === Node.ELEMENT_NODE) {
+                        walk(child);
+                        flush();
+                    }
+                }
+            }
+        };
+        walk(cell);
+        flush();
+        return parts.join('');
+    };
+    return {
+        id: table.id,
+        className: table.className,
+        rows: Array.from(table.querySelectorAll('tr'), (row) =>
+            Array.from(row.querySelectorAll('td, th'), (cell) =>
+                [cellText(cell), parseInt(cell.getAttribute('rowspan') || '1', 10) || 1])),
+    };
+}
+"""
+
+def table_cells(table):
     """
-    Get timetable data from the SIT portal.
-    
-    Args:
-        username (str, optional): Login username. If None, uses default USERNAME.
-        password (str, optional): Login password. If None, uses default PASSWORD.
-        headless (bool): Whether to run browser in headless mode. Default is False.
-        output_filename (str): Base filename for output files (without extension).
-    
-    Returns:
-        pandas.DataFrame: The extracted timetable data, or None if extraction failed.
+    Cells of a BeautifulSoup table as rows of [text, rowspan], with <br>
+    tags turned into "|"
     """
-    # Use provided credentials or fall back to defaults
-    login_username = username or USERNAME
-    login_password = password or PASSWORD
+    cell_rows = []
+    for row in table.find_all('tr'):
+        row_cells = []
+        for cell in row.find_all(['td', 'th']):
+            # Get cell content with br tag replacement
+            cell_html = str(cell)
+            cell_html = cell_html.replace('<br>', '|')
+            cell_html = cell_html.replace('<br/>', '|')
+            cell_html = cell_html.replace('<br />', '|')
+            cell_html = cell_html.replace('<BR>', '|')
+            cell_html = cell_html.replace('<BR/>', '|')
+            cell_html = cell_html.replace('<BR />', '|')
+
+            modified_cell = BeautifulSoup(cell_html, 'html.parser')
+            cell_text = modified_cell.get_text(strip=True)
+
+            # Check for rowspan
+            row_cells.append([cell_text, int(cell.get('rowspan', 1))])
+        cell_rows.append(row_cells)
+    return cell_rows
+
+def expand_rowspans(cell_rows):
+    """
+    Lay rows of [text, rowspan] cells out on the 8-column grid (Time + 7
+    days), repeating each spanning cell in the rows it covers
+    """
+    rows_data = []
+
+    # Track cells that span multiple rows
+    spanning_cells = {}  # {col_index: {'content': text, 'remaining_rows': count}}
+
+    for cells in cell_rows:
+        row_data = []
+        cell_idx = 0
+
+        # Process each column position
+        col_pos = 0
+        while col_pos < 8:  # 8 columns total (Time + 7 days)
+            # Check if this column has a spanning cell from previous rows
+            if col_pos in spanning_cells and spanning_cells[col_pos]['remaining_rows'] > 0:
+                # Use the spanning cell content
+                row_data.append(spanning_cells[col_pos]['content'])
+                spanning_cells[col_pos]['remaining_rows'] -= 1
+
+                # Remove if no more rows to span
+                if spanning_cells[col_pos]['remaining_rows'] == 0:
+                    del spanning_cells[col_pos]
+            else:
+                # Process current cell if available
+                if cell_idx < len(cells):
+                    cell_text, rowspan = cells[cell_idx]
+
+                    row_data.append(cell_text)
+
+                    # If cell spans multiple rows, track it
+                    if rowspan > 1:
+                        spanning_cells[col_pos] = {
+                            'content': cell_text,
+                            'remaining_rows': rowspan - 1
+                        }
+
+                    cell_idx += 1
+                else:
+                    # No more cells, add empty content
+                    row_data.append('')
+
+            col_pos += 1
+
+        rows_data.append(row_data)
+
+    return rows_data
+
+def parse_table_with_rowspan(table):
+    """Parse HTML table handling rowspan attributes properly"""
+    return expand_rowspans(table_cells(table))
+
+def rows_to_dataframe(parsed_rows):
+    """
+    DataFrame from parsed rows, using the first row as headers. Returns None
+    if there are no headers or no data rows.
+    """
+    # Extract headers from first row
+    headers = parsed_rows[0] if parsed_rows else []
+    data_rows = parsed_rows[1:] if len(parsed_rows) > 1 else []
+
+    logger.debug("Headers: %s", headers)
+    logger.debug("Number of data rows: %s", len(data_rows))
+
+    if not (data_rows and headers):
+        return None
+
+    # Ensure all rows have the same number of columns as headers
+    max_cols = len(headers)
+    normalized_rows = []
+
+    for row in data_rows:
+        # Pad or trim row to match header length
+        if len(row) < max_cols:
+            row.extend([''] * (max_cols - len(row)))
+        elif len(row) > max_cols:
+            row = row[:max_cols]
+        normalized_rows.append(row)
+
+    return pd.DataFrame(normalized_rows, columns=headers)
+
+def save_timetable_csv(df, csv_filename=None):
+    """Write the timetable where the rest of the project reads it (or to csv_filename)"""
+    csv_filename = csv_filename or os.path.join(SCRIPT_DIR, 'weekly_schedule_timetable.csv')
+    df.to_csv(csv_filename, index=False)
+    logger.info("Timetable saved to %s", csv_filename)
+    logger.debug("DataFrame shape %s, columns %s", df.shape, list(df.columns))
+
+def parse_table_manually(target_table):
+    """
+    Fallback parser: read the table row by row without rowspan handling,
+    drop the first row and the weekend columns
+    """
+    df = None
+    rows = []
+    headers = []
+
+    # Get headers from thead or first tr
+    thead = target_table.find('thead')
+    if thead:
+        header_row = thead.find('tr')
+        if header_row:
+            headers = [th.get_text(strip=True) for th in header_row.find_all(['th', 'td'])]
+    else:
+        # If no thead, try to get headers from first row
+        first_row = target_table.find('tr')
+        if first_row:
+            headers = [th.get_text(strip=True) for th in first_row.find_all(['th', 'td'])]
+
+    # Get data rows from tbody or all tr elements
+    tbody = target_table.find('tbody')
+    if tbody:
+        data_rows = tbody.find_all('tr')
+    else:
+        data_rows = target_table.find_all('tr')
+        # Skip first row if it contains headers
+        if headers and data_rows:
+            data_rows = data_rows[1:]
+
+    # Extract data from each row
+    for row in data_rows:
+        cells = row.find_all(['td', 'th'])
+        row_data = []
+        for cell in cells:
+            # Get the HTML content and replace <br /> tags with |
+            cell_html = str(cell)
+            # Replace various forms of br tags with |
+            cell_html = cell_html.replace('<br>', '|')
+            cell_html = cell_html.replace('<br/>', '|')
+            cell_html = cell_html.replace('<br />', '|')
+            cell_html = cell_html.replace('<BR>', '|')
+            cell_html = cell_html.replace('<BR/>', '|')
+            cell_html = cell_html.replace('<BR />', '|')
+
+            # Parse the modified HTML and extract text
+            modified_cell = BeautifulSoup(cell_html, 'html.parser')
+            cell_text = modified_cell.get_text(strip=True)
+            row_data.append(cell_text)
+
+        # Add all rows to preserve timetable structure, including empty ones
+        rows.append(row_data)
+
+    # Create DataFrame if we have data
+    if rows:
+        # Ensure all rows have the same number of columns
+        max_cols = max(len(row) for row in rows) if rows else 0
+
+        # Create or adjust headers
+        if not headers or len(headers) < max_cols:
+            headers = [f'Column_{i+1}' for i in range(max_cols)]
+        elif len(headers) > max_cols:
+            headers = headers[:max_cols]
+
+        # Pad rows if necessary
+        for row in rows:
+            while len(row) < max_cols:
+                row.append('')
+            # Trim if too long
+            if len(row) > max_cols:
+                row = row[:max_cols]
+
+        # Create DataFrame
+        df = pd.DataFrame(rows, columns=headers)
+
+        # Remove the first row
+        df = df.drop(df.index[0]).reset_index(drop=True)
+        logger.debug("Removed first row. DataFrame now has %s rows.", len(df))
+
+        # Filter out Saturday and Sunday columns
+        columns_to_keep = []
+        for col in df.columns:
+            col_lower = col.lower()
+            # Keep the column if it doesn't contain 'saturday', 'sunday', 'sat', or 'sun'
+            if not any(day in col_lower for day in ['saturday', 'sunday', 'sat|', 'sun|']):
+                columns_to_keep.append(col)
+            else:
+                logger.debug("Filtering out weekend column: %s", col)
+
+        # Keep only weekday columns
+        df = df[columns_to_keep]
+        logger.debug("After filtering weekends, DataFrame shape: %s", df.shape)
+
+        # Save to CSV
+        df.to_csv(os.path.join(SCRIPT_DIR, 'weekly_schedule_timetable.csv'), index=False)
+        logger.info("Weekly schedule table saved to weekly_schedule_timetable.csv with shape: %s", df.shape)
+
+        # Show the complete DataFrame
+        logger.debug("Complete Weekly Schedule Data (Weekdays Only):\n%s", Lazy(df.to_string, index=False))
+
+        # Show basic info about the DataFrame
+        logger.debug("DataFrame Info:")
+        logger.debug("Shape: %s", df.shape)
+        logger.debug("Columns: %s", list(df.columns))
     
-    with sync_playwright() as p:
-        browser = p.chromium.launch(
-            headless=headless,
-            args=[
-                '--disable-blink-features=AutomationControlled',
-                '--disable-dev-shm-usage',
-                '--no-sandbox',
-                '--disable-setuid-sandbox',
-                '--disable-web-security',
-                '--disable-features=VizDisplayCompositor',
-                '--disable-background-timer-throttling',
-                '--disable-backgrounding-occluded-windows',
-                '--disable-renderer-backgrounding'
-            ]
-        )
-        
-        context = browser.new_context(
-            viewport={'width': 1366, 'height': 768},
-            user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-            extra_http_headers={
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
-                'Accept-Encoding': 'gzip, deflate',
-                'DNT': '1',
-                'Connection': 'keep-alive',
-                'Upgrade-Insecure-Requests': '1',
-            }
-        )
-        
-        page = context.new_page()
-        setup_stealth_page(page)
-        
-        # Simulate human-like behavior
-        time.sleep(random.uniform(1, 3))
-        
+    return df
+
+class TimetableFetch:
+    """
+    One portal session run as the named steps in FETCH_STEPS:
+
+        login               sign on (Incapsula check, credentials, redirect)
+        landing_grouplet    open the landing page grouplet
+        schedule_component  open the weekly schedule and resolve its iframe
+        date_set            fill in the start date
+        refresh             refresh the calendar for that date
+        extract             read the WEEKLY_SCHED_HTMLAREA table, as a JSON
+                            grid built inside the page ("dom") or by parsing
+                            the full page HTML ("html", also the fallback)
+
+    A checkpoint is saved after every good step, so a retry (in this run or
+    the next one) resumes from the last good step instead of signing on
+    again. Screenshots and page sources go to the run's ArtifactStore.
+    """
+
+    def __init__(self, context, page, launch, timeouts, checkpoint, artifacts, username, password, start_date,
+                 extraction='dom', signon_url=SIGNON_URL, csv_path=None):
+        self.context = context
+        self.page = page
+        self.launch = launch
+        self.timeouts = timeouts
+        self.checkpoint = checkpoint
+        self.artifacts = artifacts
+        self.username = username
+        self.password = password
+        self.start_date = start_date
+        self.extraction = extraction
+        self.signon_url = signon_url
+        self.csv_path = csv_path
+        self.df = None
+
+    def run(self, resume_from=0, resume_url=None):
+        """
+        Run the steps from FETCH_STEPS[resume_from] on, opening resume_url
+        first when resuming. Returns the DataFrame (or None).
+        """
+        if resume_url:
+            self.resume(FETCH_STEPS[resume_from], resume_url)
+        for step in FETCH_STEPS[resume_from:]:
+            logger.info("Step %s", step)
+            getattr(self, step)()
+            self.checkpoint.save(step, self.context, self.page.url)
+        return self.df
+
+    def resume(self, step, url):
+        """Reopen the page a step starts from, checking the session is still signed in"""
+        logger.info("Resuming at %s from %s", step, url)
+        with self.timeouts.step('iframe_load') as timeout:
+            self.page.goto(url, wait_until='networkidle', timeout=timeout)
+        if 'signon' in self.page.url.lower() or self.page.locator('#userNameInput').count() > 0:
+            raise SessionExpiredError(step, "session from the checkpoint is no longer signed in")
+
+    def save_failure(self, name):
+        """Keep a screenshot and the source of the page a step failed on"""
+        if not self.artifacts.wants():
+            return
+        if self.launch['screenshots']:
+            self.artifacts.save_screenshot(name, self.page)
         try:
-            # Navigate with realistic timing
+            self.artifacts.save_html(name, self.page.content())
+        except Exception as e:
+            logger.warning("Could not save debug HTML: %s", e)
+
+    def login(self):
+        page = self.page
+        timeouts = self.timeouts
+
+        # Navigate with realistic timing
+        with timeouts.step('signon') as timeout:
             response = page.goto(
-                "https://in4sit.singaporetech.edu.sg/CSSISSTD/signon.html",
-                wait_until='domcontentloaded'
+                self.signon_url,
+                wait_until='domcontentloaded',
+                timeout=timeout
             )
-            
-            # Wait and check for Incapsula
-            time.sleep(random.uniform(3, 7))
-            
-            # Look for Incapsula indicators
-            incapsula_detected = page.evaluate("""
-                () => {
-                    const content = document.body.innerText.toLowerCase();
-                    return content.includes('incapsula') || 
-                           content.includes('access denied') ||
-                           content.includes('blocked') ||
-                           document.querySelector('[data-cy="challenge"]') !== null;
-                }
-            """)
-            
-            if incapsula_detected:
-                print("Incapsula challenge detected, waiting...")
-                # Wait for challenge to resolve
+
+        # Wait and check for Incapsula
+        time.sleep(random.uniform(3, 7))
+
+        # Look for Incapsula indicators
+        incapsula_detected = page.evaluate("""
+            () => {
+                const content = document.body.innerText.toLowerCase();
+                return content.includes('incapsula') ||
+                       content.includes('access denied') ||
+                       content.includes('blocked') ||
+                       document.querySelector('[data-cy="challenge"]') !== null;
+            }
+        """)
+
+        if incapsula_detected:
+            logger.info("Incapsula challenge detected, waiting...")
+            # Wait for challenge to resolve
+            with timeouts.step('incapsula', error=AccessBlockedError) as timeout:
                 page.wait_for_function(
                     "() => !document.body.innerText.toLowerCase().includes('incapsula')",
-                    timeout=60000
+                    timeout=timeout
                 )
-            
-            # Continue with normal flow
-            page.wait_for_load_state('networkidle')
-            print(f"Successfully accessed: {page.url}")
-            
-            # Fill in login credentials
-            print("Looking for login form elements...")
-            
-            # Wait for login form to be available
-            page.wait_for_selector('#userNameInput', timeout=10000)
-            
-            # Locate username input field
-            username_input = page.locator('#userNameInput')
-            if username_input.is_visible():
-                print("Found username input field")
-                # Clear any existing text and fill with preset username
-                username_input.clear()
-                time.sleep(random.uniform(0.5, 1.5))  # Human-like delay
-                username_input.fill(login_username)
-                print(f"Filled username: {login_username}")
+
+        # Continue with normal flow
+        with timeouts.step('signon_idle') as timeout:
+            page.wait_for_load_state('networkidle', timeout=timeout)
+        logger.debug("Successfully accessed: %s", page.url)
+
+        # Fill in login credentials
+        logger.debug("Looking for login form elements...")
+
+        # Wait for login form to be available
+        with timeouts.step('login_form') as timeout:
+            page.wait_for_selector('#userNameInput', timeout=timeout)
+
+        # Locate username input field
+        username_input = page.locator('#userNameInput')
+        if username_input.is_visible():
+            logger.debug("Found username input field")
+            # Clear any existing text and fill with preset username
+            username_input.clear()
+            time.sleep(random.uniform(0.5, 1.5))  # Human-like delay
+            username_input.fill(self.username)
+            logger.debug("Filled username: %s", self.username)
+        else:
+            logger.debug("Username input field not visible")
+
+        # Locate password input field
+        password_input = page.locator('#passwordInput')
+        if password_input.is_visible():
+            logger.debug("Found password input field")
+            # Clear any existing text and fill with preset password
+            password_input.clear()
+            time.sleep(random.uniform(0.5, 1.5))  # Human-like delay
+            password_input.fill(self.password)
+            logger.debug("Filled password (hidden for security)")
+        else:
+            logger.debug("Password input field not visible")
+
+        # Click the specific submit button (span element with id "submitButton")
+        logger.debug("Looking for submit button...")
+
+        # Wait for the submit button to be available
+        with timeouts.step('submit_button') as timeout:
+            page.wait_for_selector('#submitButton', timeout=timeout)
+
+        submit_button = page.locator('#submitButton')
+        if submit_button.is_visible():
+            logger.debug("Found submit button (span#submitButton)")
+
+            # Wait for navigation after clicking submit
+            with timeouts.step('login_redirect') as timeout:
+                with page.expect_navigation(wait_until='networkidle', timeout=timeout):
+                    submit_button.click()
+                    logger.debug("Clicked submit button, waiting for redirect...")
+        else:
+            logger.debug("Submit button not visible")
+            # Fallback: try pressing Enter on password field
+            password_input.press('Enter')
+            with timeouts.step('login_redirect') as timeout:
+                page.wait_for_load_state('networkidle', timeout=timeout)
+
+        # Wait for redirect to complete
+        time.sleep(random.uniform(2, 5))
+
+        logger.info("After login redirect: %s", page.url)
+
+    def landing_grouplet(self):
+        page = self.page
+        timeouts = self.timeouts
+
+        # STEP 1: Click the first div element
+        logger.debug("STEP 1: Looking for first div element (win0divPTNUI_LAND_REC_GROUPLET$1)...")
+
+        try:
+            with timeouts.step('landing_idle', required=False) as timeout:
+                page.wait_for_load_state('networkidle', timeout=timeout)
+            time.sleep(2)
+
+            first_div_selector = '#win0divPTNUI_LAND_REC_GROUPLET\\$1'
+            with timeouts.step('landing_grouplet') as timeout:
+                page.wait_for_selector(first_div_selector, timeout=timeout)
+
+            first_div = page.locator(first_div_selector)
+            if first_div.is_visible():
+                logger.debug("Found first div element (win0divPTNUI_LAND_REC_GROUPLET$1)")
+                time.sleep(random.uniform(1, 2))
+                first_div.click()
+                logger.debug("Clicked first div element")
+                with timeouts.step('landing_click_idle', required=False) as timeout:
+                    page.wait_for_load_state('networkidle', timeout=timeout)
+                time.sleep(random.uniform(2, 3))
+            else:
+                logger.debug("First div element not visible")
+                # page.screenshot(path=os.path.join(SCRIPT_DIR, "step1_div_not_found.png"))
+
+        except FetchError:
+            raise
+        except Exception as step1_error:
+            logger.warning("Error in STEP 1: %s", step1_error)
+            # page.screenshot(path=os.path.join(SCRIPT_DIR, "step1_error.png"))
+
+    def schedule_component(self):
+        page = self.page
+        timeouts = self.timeouts
+
+        # STEP 2: Click the second div element
+        logger.debug("STEP 2: Looking for second div element (win2div$ICField$11$$1)...")
+
+        try:
+            with timeouts.step('schedule_idle', required=False) as timeout:
+                page.wait_for_load_state('networkidle', timeout=timeout)
+            time.sleep(2)
+
+            # Use CSS selector that matches both win1div and win2div variations
+            second_div_selector = '[id*="div\\$ICField\\$11\\$\\$1"]'
+            with timeouts.step('schedule_component') as timeout:
+                page.wait_for_selector(second_div_selector, timeout=timeout)
+
+            second_div = page.locator(second_div_selector)
+            if second_div.is_visible():
+                # Get the actual ID for logging
+                actual_id = second_div.get_attribute('id')
+                logger.debug("Found second div element (%s)", actual_id)
+                time.sleep(random.uniform(1, 2))
+                second_div.click()
+                logger.debug("Clicked second div element")
+                with timeouts.step('schedule_click_idle', required=False) as timeout:
+                    page.wait_for_load_state('networkidle', timeout=timeout)
+                time.sleep(random.uniform(2, 3))
             else:
-                print("Username input field not visible")
-            
-            # Locate password input field
-            password_input = page.locator('#passwordInput')
-            if password_input.is_visible():
-                print("Found password input field")
-                # Clear any existing text and fill with preset password
-                password_input.clear()
+                logger.debug("Second div element not visible")
+                if self.launch['screenshots']:
+                    self.artifacts.save_screenshot("step2_div_not_found", page)
+
+        except Exception as step2_error:
+            logger.warning("Error in STEP 2: %s", step2_error)
+            # get_timetable saves the failing page (save_failure)
+            if isinstance(step2_error, FetchError):
+                raise
+
+        # TABLE EXTRACTION: Navigate to iframe and extract specific table
+        logger.debug("TABLE EXTRACTION: Navigating to iframe content and looking for WEEKLY_SCHED_HTMLAREA table...")
+
+        # Wait for the page to fully load
+        with timeouts.step('iframe_idle', required=False) as timeout:
+            page.wait_for_load_state('networkidle', timeout=timeout)
+        time.sleep(3)
+
+        # Check if iframe exists and get its source URL
+        iframe_selector = '#main_target_win0'
+        iframe_exists = page.locator(iframe_selector).count() > 0
+
+        if iframe_exists:
+            iframe_src = page.locator(iframe_selector).get_attribute('src')
+            logger.debug("Found iframe with source: %s", iframe_src)
+
+            # Navigate to the iframe source URL (recorded in the checkpoint,
+            # so a retry can come straight back here)
+            logger.debug("Navigating to iframe source...")
+            with timeouts.step('iframe_load') as timeout:
+                page.goto(iframe_src, wait_until='networkidle', timeout=timeout)
+            time.sleep(3)
+
+            # Take screenshot after navigation (kept only in "all" artifact mode)
+            if self.launch['screenshots']:
+                self.artifacts.save_screenshot("iframe_content", page, on_error=False)
+
+        else:
+            logger.debug("Iframe not found, searching for table on current page...")
+
+    def date_set(self):
+        page = self.page
+        timeouts = self.timeouts
+
+        # Click the first element with ID DERIVED_CLASS_S_SSR_DISP_TITLE_LBL
+        try:
+            logger.debug("Clicking element with ID DERIVED_CLASS_S_SSR_DISP_TITLE_LBL...")
+            title_element_selector = '#DERIVED_CLASS_S_SSR_DISP_TITLE_LBL'
+
+            # Wait for the element to be available
+            with timeouts.step('title_label', required=False) as timeout:
+                page.wait_for_selector(title_element_selector, timeout=timeout)
+
+            title_element = page.locator(title_element_selector)
+            if title_element.is_visible():
+                title_element.click()
+                logger.debug("Successfully clicked DERIVED_CLASS_S_SSR_DISP_TITLE_LBL element")
+
+                # Wait a moment for any potential page changes
+                time.sleep(random.uniform(1, 2))
+                with timeouts.step('title_idle', required=False) as timeout:
+                    page.wait_for_load_state('networkidle', timeout=timeout)
+            else:
+                logger.debug("DERIVED_CLASS_S_SSR_DISP_TITLE_LBL element not visible")
+
+        except Exception as click_error:
+            logger.warning("Error clicking DERIVED_CLASS_S_SSR_DISP_TITLE_LBL: %s", click_error)
+            # Continue with next click even if this fails
+
+        # start_date = datetime.date(2025, 8, 29)
+        start_date = self.start_date
+        next_working_day_str = (start_date + datetime.timedelta(days=3 if start_date.weekday() == 4 else (2 if start_date.weekday() == 5 else (1 if start_date.weekday() == 6 else 1)))).strftime("%d/%m/%Y")
+
+        try:
+            logger.debug("Clicking element with ID DERIVED_CLASS_S_START_DT...")
+            title_element_selector = '#DERIVED_CLASS_S_START_DT'
+
+            # Wait for the element to be available
+            with timeouts.step('start_date') as timeout:
+                page.wait_for_selector(title_element_selector, timeout=timeout)
+            startdate_input = page.locator('#DERIVED_CLASS_S_START_DT')
+            if startdate_input.is_visible():
+                logger.debug("Found startdate input field")
+                # Clear any existing text and fill with preset username
+                startdate_input.clear()
                 time.sleep(random.uniform(0.5, 1.5))  # Human-like delay
-                password_input.fill(login_password)
-                print("Filled password (hidden for security)")
+                startdate_input.fill(next_working_day_str)
+                logger.debug("Filled start date: %s", next_working_day_str)
             else:
-                print("Password input field not visible")
-            
-            # Click the specific submit button (span element with id "submitButton")
-            print("Looking for submit button...")
-            
-            # Wait for the submit button to be available
-            page.wait_for_selector('#submitButton', timeout=10000)
-            
-            submit_button = page.locator('#submitButton')
-            if submit_button.is_visible():
-                print("Found submit button (span#submitButton)")
-                
-                # Wait for navigation after clicking submit
-                with page.expect_navigation(wait_until='networkidle', timeout=30000):
-                    submit_button.click()
-                    print("Clicked submit button, waiting for redirect...")
+                logger.debug("Start date input field not visible")
+        except FetchError:
+            # Without the date the refresh would show the wrong week
+            raise
+        except Exception as click_error:
+            logger.warning("Error finding DERIVED_CLASS_S_START_DT: %s", click_error)
+            # Continue with next click even if this fails
+
+    def refresh(self):
+        page = self.page
+        timeouts = self.timeouts
+
+        # Click the second element with ID DERIVED_CLASS_S_SSR_REFRESH_CAL$38$
+        try:
+            logger.debug("Clicking element with ID DERIVED_CLASS_S_SSR_REFRESH_CAL$38$...")
+            refresh_element_selector = '#DERIVED_CLASS_S_SSR_REFRESH_CAL\\$38\\$'
+
+            # Wait for the element to be available
+            with timeouts.step('refresh_button') as timeout:
+                page.wait_for_selector(refresh_element_selector, timeout=timeout)
+
+            refresh_element = page.locator(refresh_element_selector)
+            if refresh_element.is_visible():
+                refresh_element.click()
+                logger.debug("Successfully clicked DERIVED_CLASS_S_SSR_REFRESH_CAL$38$ element")
+
+                # Wait a moment for any potential page changes
+                time.sleep(random.uniform(1, 2))
+                with timeouts.step('refresh_idle', required=False) as timeout:
+                    page.wait_for_load_state('networkidle', timeout=timeout)
             else:
-                print("Submit button not visible")
-                # Fallback: try pressing Enter on password field
-                password_input.press('Enter')
-                page.wait_for_load_state('networkidle', timeout=30000)
-            
-            # Wait for redirect to complete
-            time.sleep(random.uniform(2, 5))
-            
-            print(f"After login redirect: {page.url}")
-            
-            # STEP 1: Click the first div element
-            print("STEP 1: Looking for first div element (win0divPTNUI_LAND_REC_GROUPLET$1)...")
-            
-            try:
-                page.wait_for_load_state('networkidle', timeout=10000)
-                time.sleep(2)
-                
-                first_div_selector = '#win0divPTNUI_LAND_REC_GROUPLET\\$1'
-                page.wait_for_selector(first_div_selector, timeout=15000)
-                
-                first_div = page.locator(first_div_selector)
-                if first_div.is_visible():
-                    print("Found first div element (win0divPTNUI_LAND_REC_GROUPLET$1)")
-                    time.sleep(random.uniform(1, 2))
-                    first_div.click()
-                    print("Clicked first div element")
-                    page.wait_for_load_state('networkidle', timeout=10000)
-                    time.sleep(random.uniform(2, 3))
-                else:
-                    print("First div element not visible")
-                    # page.screenshot(path=os.path.join(SCRIPT_DIR, "step1_div_not_found.png"))
-                    
-            except Exception as step1_error:
-                print(f"Error in STEP 1: {step1_error}")
-                # page.screenshot(path=os.path.join(SCRIPT_DIR, "step1_error.png"))
-            
-            # STEP 2: Click the second div element
-            print("STEP 2: Looking for second div element (win2div$ICField$11$$1)...")
-            
-            try:
-                page.wait_for_load_state('networkidle', timeout=10000)
-                time.sleep(2)
-                
-                # Use CSS selector that matches both win1div and win2div variations
-                second_div_selector = '[id*="div\\$ICField\\$11\\$\\$1"]'
-                page.wait_for_selector(second_div_selector, timeout=15000)
-                
-                second_div = page.locator(second_div_selector)
-                if second_div.is_visible():
-                    # Get the actual ID for logging
-                    actual_id = second_div.get_attribute('id')
-                    print(f"Found second div element ({actual_id})")
-                    time.sleep(random.uniform(1, 2))
-                    second_div.click()
-                    print("Clicked second div element")
-                    page.wait_for_load_state('networkidle', timeout=10000)
-                    time.sleep(random.uniform(2, 3))
-                else:
-                    print("Second div element not visible")
-                    page.screenshot(path=os.path.join(SCRIPT_DIR, "step2_div_not_found.png"))
-                    
-            except Exception as step2_error:
-                print(f"Error in STEP 2: {step2_error}")
-                page.screenshot(path=os.path.join(SCRIPT_DIR, "step2_error.png"))
-            
-            # TABLE EXTRACTION: Navigate to iframe and extract specific table
-            print("TABLE EXTRACTION: Navigating to iframe content and looking for WEEKLY_SCHED_HTMLAREA table...")
-            
+                logger.debug("DERIVED_CLASS_S_SSR_REFRESH_CAL$38$ element not visible")
+
+        except FetchError:
+            raise
+        except Exception as click_error:
+            logger.warning("Error clicking DERIVED_CLASS_S_SSR_REFRESH_CAL$38$: %s", click_error)
+            # Continue with saving even if click fails
+
+    def extract(self):
+        # Walk the one table inside the page and bring back a compact grid;
+        # the full-page HTML path below is the fallback
+        if self.extraction == 'dom':
             try:
-                # Wait for the page to fully load
-                page.wait_for_load_state('networkidle', timeout=10000)
-                time.sleep(3)
-                
-                # Check if iframe exists and get its source URL
-                iframe_selector = '#main_target_win0'
-                iframe_exists = page.locator(iframe_selector).count() > 0
-                
-                if iframe_exists:
-                    iframe_src = page.locator(iframe_selector).get_attribute('src')
-                    print(f"Found iframe with source: {iframe_src}")
-                    
-                    # Navigate to the iframe source URL
-                    print("Navigating to iframe source...")
-                    page.goto(iframe_src, wait_until='networkidle', timeout=30000)
-                    time.sleep(3)
-                    
-                    # Take screenshot after navigation
-                    page.screenshot(path=os.path.join(SCRIPT_DIR, "iframe_content.png"))
-                    print("Screenshot of iframe content saved as iframe_content.png")
-                    
+                with profile_stage('dom_extract'):
+                    grid = self.page.evaluate(TABLE_GRID_SCRIPT)
+                if grid:
+                    logger.debug("Found table %s in the page (%s rows)", grid['id'], len(grid['rows']))
+                    df = rows_to_dataframe(expand_rowspans(grid['rows']))
+                    if df is not None:
+                        save_timetable_csv(df, self.csv_path)
+                        self.df = df
+                        return
+                    logger.warning("Table grid has no data rows, falling back to full HTML parsing...")
                 else:
-                    print("Iframe not found, searching for table on current page...")
-                
-                # Click the first element with ID DERIVED_CLASS_S_SSR_DISP_TITLE_LBL
-                try:
-                    print("Clicking element with ID DERIVED_CLASS_S_SSR_DISP_TITLE_LBL...")
-                    title_element_selector = '#DERIVED_CLASS_S_SSR_DISP_TITLE_LBL'
-                    
-                    # Wait for the element to be available
-                    page.wait_for_selector(title_element_selector, timeout=10000)
-                    
-                    title_element = page.locator(title_element_selector)
-                    if title_element.is_visible():
-                        title_element.click()
-                        print("Successfully clicked DERIVED_CLASS_S_SSR_DISP_TITLE_LBL element")
-                        
-                        # Wait a moment for any potential page changes
-                        time.sleep(random.uniform(1, 2))
-                        page.wait_for_load_state('networkidle', timeout=5000)
-                    else:
-                        print("DERIVED_CLASS_S_SSR_DISP_TITLE_LBL element not visible")
-                        
-                except Exception as click_error:
-                    print(f"Error clicking DERIVED_CLASS_S_SSR_DISP_TITLE_LBL: {click_error}")
-                    # Continue with next click even if this fails
-                
-                # start_date = datetime.date(2025, 8, 29)
-                next_working_day_str = (start_date + datetime.timedelta(days=3 if start_date.weekday() == 4 else (2 if start_date.weekday() == 5 else (1 if start_date.weekday() == 6 else 1)))).strftime("%d/%m/%Y")
-                
-                try:
-                    print("Clicking element with ID DERIVED_CLASS_S_START_DT...")
-                    title_element_selector = '#DERIVED_CLASS_S_START_DT'
-                    
-                    # Wait for the element to be available
-                    page.wait_for_selector(title_element_selector, timeout=10000)
-                    startdate_input = page.locator('#DERIVED_CLASS_S_START_DT')
-                    if startdate_input.is_visible():
-                        print("Found startdate input field")
-                        # Clear any existing text and fill with preset username
-                        startdate_input.clear()
-                        time.sleep(random.uniform(0.5, 1.5))  # Human-like delay
-                        startdate_input.fill(next_working_day_str)
-                        print(f"Filled start date: {next_working_day_str}")
-                    else:
-                        print("Start date input field not visible")
-                except Exception as click_error:
-                    print(f"Error finding DERIVED_CLASS_S_START_DT: {click_error}")
-                    # Continue with next click even if this fails
-                
-                # Click the second element with ID DERIVED_CLASS_S_SSR_REFRESH_CAL$38$
-                try:
-                    print("Clicking element with ID DERIVED_CLASS_S_SSR_REFRESH_CAL$38$...")
-                    refresh_element_selector = '#DERIVED_CLASS_S_SSR_REFRESH_CAL\\$38\\$'
-                    
-                    # Wait for the element to be available
-                    page.wait_for_selector(refresh_element_selector, timeout=10000)
-                    
-                    refresh_element = page.locator(refresh_element_selector)
-                    if refresh_element.is_visible():
-                        refresh_element.click()
-                        print("Successfully clicked DERIVED_CLASS_S_SSR_REFRESH_CAL$38$ element")
-                        
-                        # Wait a moment for any potential page changes
-                        time.sleep(random.uniform(1, 2))
-                        page.wait_for_load_state('networkidle', timeout=5000)
-                    else:
-                        print("DERIVED_CLASS_S_SSR_REFRESH_CAL$38$ element not visible")
-                        
-                except Exception as click_error:
-                    print(f"Error clicking DERIVED_CLASS_S_SSR_REFRESH_CAL$38$: {click_error}")
-                    # Continue with saving even if click fails
-                    
-                # Get the page HTML content (either iframe content or current page)
-                html_content = page.content()
-                
-                # Parse with BeautifulSoup
+                    logger.warning("Table not found in the page, falling back to full HTML parsing...")
+            except Exception as dom_error:
+                logger.warning("In-page extraction failed: %s", dom_error)
+                logger.debug("Falling back to full HTML parsing...")
+
+        self.extract_from_html()
+
+    def extract_from_html(self):
+        page = self.page
+
+        try:
+            # Get the page HTML content (either iframe content or current page)
+            html_content = page.content()
+
+            # Parse with BeautifulSoup
+            with profile_stage('html_parse'):
                 soup = BeautifulSoup(html_content, 'html.parser')
-                
-                # Look specifically for the table with ID WEEKLY_SCHED_HTMLAREA
-                target_table = soup.find('table', id='WEEKLY_SCHED_HTMLAREA')
-                
+
+            # Look specifically for the table with ID WEEKLY_SCHED_HTMLAREA
+            target_table = soup.find('table', id='WEEKLY_SCHED_HTMLAREA')
+
+            if not target_table:
+                # Try alternative selectors
+                target_table = soup.find(id='WEEKLY_SCHED_HTMLAREA')
                 if not target_table:
-                    # Try alternative selectors
-                    target_table = soup.find(id='WEEKLY_SCHED_HTMLAREA')
-                    if not target_table:
-                        target_table = soup.find(attrs={'id': lambda x: x and 'WEEKLY_SCHED_HTMLAREA' in x})
-                
-                if target_table:
-                    print("Found table with ID WEEKLY_SCHED_HTMLAREA!")
-                    
-                    # Get table attributes for identification
-                    table_id = target_table.get('id', 'No ID')
-                    table_class = target_table.get('class', 'No Class')
-                    if isinstance(table_class, list):
-                        table_class = ' '.join(table_class)
-                    
-                    print(f"Table ID: {table_id}")
-                    print(f"Table Class: {table_class}")
-                    
-                    # Custom parser to handle rowspan properly
-                    def parse_table_with_rowspan(table):
-                        """Parse HTML table handling rowspan attributes properly"""
-                        rows_data = []
-                        
-                        # Get all rows
-                        all_rows = table.find_all('tr')
-                        
-                        # Track cells that span multiple rows
-                        spanning_cells = {}  # {col_index: {'content': text, 'remaining_rows': count}}
-                        
-                        for row_idx, row in enumerate(all_rows):
-                            cells = row.find_all(['td', 'th'])
-                            row_data = []
-                            cell_idx = 0
-                            
-                            # Process each column position
-                            col_pos = 0
-                            while col_pos < 8:  # 8 columns total (Time + 7 days)
-                                # Check if this column has a spanning cell from previous rows
-                                if col_pos in spanning_cells and spanning_cells[col_pos]['remaining_rows'] > 0:
-                                    # Use the spanning cell content
-                                    row_data.append(spanning_cells[col_pos]['content'])
-                                    spanning_cells[col_pos]['remaining_rows'] -= 1
-                                    
-                                    # Remove if no more rows to span
-                                    if spanning_cells[col_pos]['remaining_rows'] == 0:
-                                        del spanning_cells[col_pos]
-                                else:
-                                    # Process current cell if available
-                                    if cell_idx < len(cells):
-                                        cell = cells[cell_idx]
-                                        
-                                        # Get cell content with br tag replacement
-                                        cell_html = str(cell)
-                                        cell_html = cell_html.replace('<br>', '|')
-                                        cell_html = cell_html.replace('<br/>', '|')
-                                        cell_html = cell_html.replace('<br />', '|')
-                                        cell_html = cell_html.replace('<BR>', '|')
-                                        cell_html = cell_html.replace('<BR/>', '|')
-                                        cell_html = cell_html.replace('<BR />', '|')
-                                        
-                                        modified_cell = BeautifulSoup(cell_html, 'html.parser')
-                                        cell_text = modified_cell.get_text(strip=True)
-                                        
-                                        # Check for rowspan
-                                        rowspan = int(cell.get('rowspan', 1))
-                                        
-                                        row_data.append(cell_text)
-                                        
-                                        # If cell spans multiple rows, track it
-                                        if rowspan > 1:
-                                            spanning_cells[col_pos] = {
-                                                'content': cell_text,
-                                                'remaining_rows': rowspan - 1
-                                            }
-                                        
-                                        cell_idx += 1
-                                    else:
-                                        # No more cells, add empty content
-                                        row_data.append('')
-                                
-                                col_pos += 1
-                            
-                            rows_data.append(row_data)
-                        
-                        return rows_data
-                    
-                    try:
-                        # Use custom parser
+                    target_table = soup.find(attrs={'id': lambda x: x and 'WEEKLY_SCHED_HTMLAREA' in x})
+
+            if target_table:
+                logger.debug("Found table with ID WEEKLY_SCHED_HTMLAREA!")
+
+                # Get table attributes for identification
+                table_id = target_table.get('id', 'No ID')
+                table_class = target_table.get('class', 'No Class')
+                if isinstance(table_class, list):
+                    table_class = ' '.join(table_class)
+
+                logger.debug("Table ID: %s", table_id)
+                logger.debug("Table Class: %s", table_class)
+
+                try:
+                    # Use custom parser
+                    with profile_stage('parse_table_with_rowspan'):
                         parsed_rows = parse_table_with_rowspan(target_table)
-                        
-                        if parsed_rows:
-                            # Extract headers from first row
-                            headers = parsed_rows[0] if parsed_rows else []
-                            data_rows = parsed_rows[1:] if len(parsed_rows) > 1 else []
-                            
-                            print(f"Successfully parsed table with custom parser!")
-                            print(f"Headers: {headers}")
-                            print(f"Number of data rows: {len(data_rows)}")
-                            
-                            # Create DataFrame
-                            if data_rows and headers:
-                                # Ensure all rows have the same number of columns as headers
-                                max_cols = len(headers)
-                                normalized_rows = []
-                                
-                                for row in data_rows:
-                                    # Pad or trim row to match header length
-                                    if len(row) < max_cols:
-                                        row.extend([''] * (max_cols - len(row)))
-                                    elif len(row) > max_cols:
-                                        row = row[:max_cols]
-                                    normalized_rows.append(row)
-                                
-                                df = pd.DataFrame(normalized_rows, columns=headers)
-                                
-                                # Save to CSV
-                                csv_filename = os.path.join(SCRIPT_DIR, 'weekly_schedule_timetable.csv')
-                                df.to_csv(csv_filename, index=False)
-                                print(f"Timetable saved to {csv_filename}")
-                                print(f"DataFrame shape: {df.shape}")
-                                print(f"DataFrame Info:")
-                                print(f"Shape: {df.shape}")
-                                print(f"Columns: {list(df.columns)}")
-                                
-                                with open('iframe_source_debug.html', 'w', encoding='utf-8') as f:
-                                    f.write(html_content)
-                                
-                                # Return the DataFrame when successful
-                                return df
-                        
-                    except Exception as custom_parser_error:
-                        print(f"Custom parser failed: {custom_parser_error}")
-                        print("Falling back to manual parsing...")
-                    
-                    # Fallback to original manual parsing if custom parser fails
-                    rows = []
-                    headers = []
-                    
-                    # Get headers from thead or first tr
-                    thead = target_table.find('thead')
-                    if thead:
-                        header_row = thead.find('tr')
-                        if header_row:
-                            headers = [th.get_text(strip=True) for th in header_row.find_all(['th', 'td'])]
-                    else:
-                        # If no thead, try to get headers from first row
-                        first_row = target_table.find('tr')
-                        if first_row:
-                            headers = [th.get_text(strip=True) for th in first_row.find_all(['th', 'td'])]
-                    
-                    # Get data rows from tbody or all tr elements
-                    tbody = target_table.find('tbody')
-                    if tbody:
-                        data_rows = tbody.find_all('tr')
-                    else:
-                        data_rows = target_table.find_all('tr')
-                        # Skip first row if it contains headers
-                        if headers and data_rows:
-                            data_rows = data_rows[1:]
-                    
-                    # Extract data from each row
-                    for row in data_rows:
-                        cells = row.find_all(['td', 'th'])
-                        row_data = []
-                        for cell in cells:
-                            # Get the HTML content and replace <br /> tags with |
-                            cell_html = str(cell)
-                            # Replace various forms of br tags with |
-                            cell_html = cell_html.replace('<br>', '|')
-                            cell_html = cell_html.replace('<br/>', '|')
-                            cell_html = cell_html.replace('<br />', '|')
-                            cell_html = cell_html.replace('<BR>', '|')
-                            cell_html = cell_html.replace('<BR/>', '|')
-                            cell_html = cell_html.replace('<BR />', '|')
-                            
-                            # Parse the modified HTML and extract text
-                            modified_cell = BeautifulSoup(cell_html, 'html.parser')
-                            cell_text = modified_cell.get_text(strip=True)
-                            row_data.append(cell_text)
-                        
-                        # Add all rows to preserve timetable structure, including empty ones
-                        rows.append(row_data)
-                    
-                    # Create DataFrame if we have data
-                    if rows:
-                        # Ensure all rows have the same number of columns
-                        max_cols = max(len(row) for row in rows) if rows else 0
-                        
-                        # Create or adjust headers
-                        if not headers or len(headers) < max_cols:
-                            headers = [f'Column_{i+1}' for i in range(max_cols)]
-                        elif len(headers) > max_cols:
-                            headers = headers[:max_cols]
-                        
-                        # Pad rows if necessary
-                        for row in rows:
-                            while len(row) < max_cols:
-                                row.append('')
-                            # Trim if too long
-                            if len(row) > max_cols:
-                                row = row[:max_cols]
-                        
+
+                    if parsed_rows:
+                        logger.debug("Successfully parsed table with custom parser!")
+
                         # Create DataFrame
-                        df = pd.DataFrame(rows, columns=headers)
-                        
-                        # Remove the first row
-                        df = df.drop(df.index[0]).reset_index(drop=True)
-                        print(f"Removed first row. DataFrame now has {len(df)} rows.")
-                        
-                        # Filter out Saturday and Sunday columns
-                        columns_to_keep = []
-                        for col in df.columns:
-                            col_lower = col.lower()
-                            # Keep the column if it doesn't contain 'saturday', 'sunday', 'sat', or 'sun'
-                            if not any(day in col_lower for day in ['saturday', 'sunday', 'sat|', 'sun|']):
-                                columns_to_keep.append(col)
-                            else:
-                                print(f"Filtering out weekend column: {col}")
-                        
-                        # Keep only weekday columns
-                        df = df[columns_to_keep]
-                        print(f"After filtering weekends, DataFrame shape: {df.shape}")
-                        
-                        # Save to CSV
-                        df.to_csv(os.path.join(SCRIPT_DIR, 'weekly_schedule_timetable.csv'), index=False)
-                        print(f"Weekly schedule table saved to weekly_schedule_timetable.csv with shape: {df.shape}")
-                        
-                        # Show the complete DataFrame
-                        print("\nComplete Weekly Schedule Data (Weekdays Only):")
-                        print(df.to_string(index=False))
-                        
-                        # Show basic info about the DataFrame
-                        print(f"\nDataFrame Info:")
-                        print(f"Shape: {df.shape}")
-                        print(f"Columns: {list(df.columns)}")
-                        
-                    with open('iframe_source_debug.html', 'w', encoding='utf-8') as f:
-                        f.write(html_content)
-                    
-                    # Return the DataFrame when successful
-                    return df
-                        
-                else:
-                    print("Table with ID WEEKLY_SCHED_HTMLAREA not found")
-                    
-                    # List all tables for debugging
-                    all_tables = soup.find_all('table')
-                    print(f"Total tables found: {len(all_tables)}")
-                    
-                    if all_tables:
-                        print("Available table IDs:")
-                        for i, table in enumerate(all_tables[:10]):  # Show first 10 tables
-                            table_id = table.get('id', 'No ID')
-                            table_class = table.get('class', 'No Class')
-                            if isinstance(table_class, list):
-                                table_class = ' '.join(table_class)
-                            print(f"  Table {i+1}: ID='{table_id}', Class='{table_class}'")
-                    
-                    # Save HTML for debugging
-                    # with open('iframe_source_debug.html', 'w', encoding='utf-8') as f:
-                    #     f.write(html_content)
-                    print("Iframe source saved as iframe_source_debug.html for debugging")
-                    return None
-                    
-            except Exception as table_error:
-                print(f"Error during table extraction: {table_error}")
-                # page.screenshot(path=os.path.join(SCRIPT_DIR, 'weekly_schedule_extraction_error.png'))
-                # print("Error screenshot saved as weekly_schedule_extraction_error.png")
-                
-                # Also save HTML for debugging
+                        df = rows_to_dataframe(parsed_rows)
+                        if df is not None:
+                            # Save to CSV
+                            save_timetable_csv(df, self.csv_path)
+
+                            self.artifacts.save_html("iframe_source", html_content, on_error=False)
+
+                            self.df = df
+                            return
+
+                except Exception as custom_parser_error:
+                    logger.warning("Custom parser failed: %s", custom_parser_error)
+                    logger.debug("Falling back to manual parsing...")
+
+                # Fallback to original manual parsing if custom parser fails
+                with profile_stage('manual_parse'):
+                    self.df = parse_table_manually(target_table)
+
+                self.artifacts.save_html("iframe_source", html_content, on_error=False)
+
+            else:
+                logger.warning("Table with ID WEEKLY_SCHED_HTMLAREA not found")
+
+                # List all tables for debugging
+                all_tables = soup.find_all('table')
+                logger.debug("Total tables found: %s", len(all_tables))
+
+                if all_tables:
+                    logger.debug("Available table IDs:")
+                    for i, table in enumerate(all_tables[:10]):  # Show first 10 tables
+                        table_id = table.get('id', 'No ID')
+                        table_class = table.get('class', 'No Class')
+                        if isinstance(table_class, list):
+                            table_class = ' '.join(table_class)
+                        logger.debug("  Table %s: ID='%s', Class='%s'", i+1, table_id, table_class)
+
+                raise PageNotFoundError('extract', "table WEEKLY_SCHED_HTMLAREA is not on the page")
+
+        except Exception as table_error:
+            logger.warning("Error during table extraction: %s", table_error)
+            # page.screenshot(path=os.path.join(SCRIPT_DIR, 'weekly_schedule_extraction_error.png'))
+            # print("Error screenshot saved as weekly_schedule_extraction_error.png")
+
+            # Also save HTML for debugging
+            if self.artifacts.wants():
                 try:
-                    html_content = page.content()
-                    with open('weekly_schedule_error.html', 'w', encoding='utf-8') as f:
-                        f.write(page.content())
-                    print("Page source saved as weekly_schedule_error.html for debugging")
+                    self.artifacts.save_html("weekly_schedule_error", page.content())
                 except Exception as debug_error:
-                    print(f"Could not save debug HTML: {debug_error}")
-        
+                    logger.warning("Could not save debug HTML: %s", debug_error)
+            raise
+
+def get_timetable(username=None, password=None, headless=False, output_filename="weekly_schedule_timetable", start_date=None, profile=None, launch_profile=None, attempts=2, on_data=None, extraction='dom', debug_artifacts=None, browser_engine=None, browser_executable=None,
+                  signon_url=SIGNON_URL, csv_path=None, timeouts=None, checkpoint_dir=CHECKPOINT_DIR):
+    """
+    Get timetable data from the SIT portal.
+
+    Args:
+        username (str, optional): Login username. If None, uses default USERNAME.
+        password (str, optional): Login password. If None, uses default PASSWORD.
+        headless (bool): Whether to run browser in headless mode. Default is False.
+        output_filename (str): Base filename for output files (without extension).
+        profile (bool | str, optional): Profile the parsing stages, True or
+            "deterministic" for cProfile, "sampling" for a stack sampler.
+            Artifacts are written to profiles/<run id>/.
+        launch_profile (str, optional): Browser launch profile from
+            browser_launch.LAUNCH_PROFILES, e.g. "low-memory" for small hosts.
+            Defaults to TIMETABLE_LAUNCH_PROFILE or "default".
+        attempts (int): How many times to run the flow. Retries resume from
+            the last good step (see TimetableFetch).
+        on_data (callable, optional): Called with the DataFrame as soon as
+            it is extracted, before the browser is shut down, so callers
+            can start on it while teardown runs.
+        extraction (str): "dom" walks the timetable table inside the page
+            and transfers only its cells; "html" transfers and parses the
+            whole page. "dom" falls back to "html" if it finds nothing.
+        debug_artifacts (str, optional): Which debug screenshots and page
+            sources to keep in debug_artifacts/<run id>/: "off", "errors" or
+            "all". Defaults to TIMETABLE_DEBUG_ARTIFACTS or "errors".
+        browser_engine (str, optional): Browser engine from
+            browser_launch.BROWSER_ENGINES, e.g. "firefox". Defaults to
+            TIMETABLE_BROWSER_ENGINE or "chromium".
+        browser_executable (str, optional): Path of the browser build to run
+            instead of Playwright's own. Defaults to
+            TIMETABLE_BROWSER_EXECUTABLE.
+        signon_url (str): Portal sign-on page, e.g. a portal_standin.py URL.
+        csv_path (str, optional): Where to write the CSV instead of
+            weekly_schedule_timetable.csv.
+        timeouts (TimeoutPolicy, optional): Step deadlines; by default they
+            are learned from and saved to step_latency.json.
+        checkpoint_dir (str): Where fetch checkpoints are kept, instead of
+            checkpoints/.
+
+    Returns:
+        pandas.DataFrame: The extracted timetable data, or None if extraction failed.
+
+    Waits use deadlines learned from earlier runs (see step_timeouts.py); a
+    step that overruns ends the attempt with a classified FetchError message
+    instead of falling through to later steps. A checkpoint from an earlier
+    run of the same account that failed less than CHECKPOINT_MAX_AGE ago is
+    resumed instead of signing on again.
+    """
+    if profile_mode(profile) and current_session() is None:
+        with ProfileSession(profile_mode(profile), label='get_timetable'):
+            return get_timetable(username, password, headless, output_filename, start_date,
+                                 launch_profile=launch_profile, attempts=attempts, on_data=on_data,
+                                 extraction=extraction, debug_artifacts=debug_artifacts,
+                                 browser_engine=browser_engine, browser_executable=browser_executable,
+                                 signon_url=signon_url, csv_path=csv_path, timeouts=timeouts,
+                                 checkpoint_dir=checkpoint_dir)
+
+    # Use provided credentials or fall back to defaults
+    login_username = username or USERNAME
+    login_password = password or PASSWORD
+    launch_profile = launch_profile or default_launch_profile()
+    launch = get_launch_profile(launch_profile)
+    browser_engine = browser_engine or default_browser_engine()
+    engine = get_browser_engine(browser_engine)
+    browser_executable = browser_executable or default_browser_executable()
+    start_date = start_date or datetime.datetime.now()
+    timeouts = timeouts or TimeoutPolicy(timeout_errors=(PlaywrightTimeoutError,))
+    checkpoint = FetchCheckpoint(login_username, checkpoint_dir=checkpoint_dir)
+    artifacts = ArtifactStore(debug_artifacts)
+    saved = checkpoint.load()
+    if saved:
+        logger.info("Found %s, resuming", checkpoint.describe())
+
+    # Peak browser and Python memory are reported when the browser closes
+    memory = MemoryMonitor()
+    with memory, artifacts, sync_playwright() as p:
+        launch_started = time.monotonic()
+        browser, context = launch_browser(p, launch, headless=headless,
+                                          storage_state=saved['storage_state'] if saved else None,
+                                          engine=engine, executable_path=browser_executable)
+        logger.info("Started %s in %.2fs", browser_engine, time.monotonic() - launch_started)
+
+        page = context.new_page()
+        setup_stealth_page(page)
+        fetch = TimetableFetch(context, page, launch, timeouts, checkpoint, artifacts,
+                               login_username, login_password, start_date, extraction,
+                               signon_url=signon_url, csv_path=csv_path)
+
+        # Simulate human-like behavior
+        time.sleep(random.uniform(1, 3))
+
+        try:
+            for attempt in range(1, attempts + 1):
+                # A learned deadline that has become too tight must not
+                # fail the retry as well
+                timeouts.fixed = attempt > 1
+                resume_from, resume_url = checkpoint.resume_point()
+                try:
+                    df = fetch.run(resume_from, resume_url)
+                    checkpoint.clear()
+                    if on_data is not None:
+                        on_data(df)
+                    return df
+                except SessionExpiredError as e:
+                    logger.warning("Fetch failed: %s, signing on again", e)
+                    checkpoint.clear()
+                except AccessBlockedError as e:
+                    # Retrying straight away will not get past the bot check
+                    logger.warning("Fetch failed: %s", e)
+                    fetch.save_failure(f"attempt{attempt}_{e.step}")
+                    break
+                except FetchError as e:
+                    logger.warning("Fetch failed (attempt %s/%s): %s", attempt, attempts, e)
+                    fetch.save_failure(f"attempt{attempt}_{e.step}")
+                except Exception as e:
+                    logger.warning("Error (attempt %s/%s): %s", attempt, attempts, e)
+                    fetch.save_failure(f"attempt{attempt}_error")
+                if attempt < attempts:
+                    logger.info("Retrying from %s", checkpoint.describe())
+
+            logger.error("Could not fetch the timetable")
+
             # Wait a bit to see the final result
-            time.sleep(5)
-            
-        except Exception as e:
-            print(f"Error: {e}")
-            # page.screenshot(path=os.path.join(SCRIPT_DIR, "error.png"))
-            # print("Error screenshot saved as error.png")
+            if not headless:
+                time.sleep(5)
             return None
         finally:
             # Ensure browser is always closed, even if an exception occurs
@@ -641,14 +942,17 @@ def get_timetable(username=None, password=None, headless=False, output_filename=
                 browser.close()
             except:
                 pass  # Ignore errors when closing browser
+            logger.info("%s (%s, launch profile: %s)", memory.summary(), browser_engine, launch_profile)
+            timeouts.save()
 
 # Main execution block - only runs when script is executed directly
 if __name__ == "__main__":
+    configure_logging()
     # Run the getter with default settings
     result = get_timetable()
     if result is not None:
-        print("\nTimetable extraction completed successfully!")
-        print(f"DataFrame shape: {result.shape}")
+        logger.info("Timetable extraction completed successfully!")
+        logger.info("DataFrame shape: %s", result.shape)
     else:
-        print("\nTimetable extraction failed.")
+        dump_recent_logs("Timetable extraction failed")
 
@@ -0,0 +1,208 @@
+import asyncio
+import datetime
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+
+from timetable_data import TIMETABLE_CSV_PATH, lessons_by_date, load_timetable, module_key
+from timetable_image_generator import build_timetable_layout, load_timetable_dataframe, rasterize_layout
+from run_log import configure_logging
+
+logger = logging.getLogger(__name__)
+
+
+def make_etag(body):
+    """Strong ETag for a response body"""
+    return '"' + hashlib.sha1(body).hexdigest() + '"'
+
+
+def json_response(payload):
+    """Pre-encoded JSON body and its ETag"""
+    body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+    return body, make_etag(body)
+
+
+class TimetableCache:
+    """
+    Responses precomputed from the latest fetched timetable CSV.
+
+    Every response body and ETag is built once when the CSV changes (checked
+    by modification time), so serving a request is a dict lookup. The parsed
+    lessons are kept too (by_date, module_lessons) for other front ends such
+    as the Telegram bot. The week image is rendered on first request and kept
+    until the CSV changes.
+    """
+
+    def __init__(self, csv_path=TIMETABLE_CSV_PATH):
+        self.csv_path = csv_path
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.week = None
+        self.dates = {}
+        self.modules = {}
+        self.by_date = {}
+        self.module_lessons = {}
+        self.image = None
+
+    def refresh(self):
+        """Rebuild the responses if the CSV changed. Returns False if there is no CSV."""
+        try:
+            mtime = os.path.getmtime(self.csv_path)
+        except OSError:
+            return False
+        if mtime == self.mtime:
+            return True
+
+        with self.lock:
+            if mtime == self.mtime:
+                return True
+
+            df = load_timetable(self.csv_path)
+            fetched_at = datetime.datetime.fromtimestamp(mtime)
+            by_date = lessons_by_date(df, fetched_at.date())
+
+            dates = {}
+            modules = {}
+            for date, lessons in sorted(by_date.items()):
+                dates[date.isoformat()] = json_response({'date': date.isoformat(), 'lessons': lessons})
+                for lesson in lessons:
+                    modules.setdefault(module_key(lesson['modCode']), []).append(
+                        {'date': date.isoformat(), **lesson})
+
+            self.week = json_response({
+                'fetched_at': fetched_at.isoformat(timespec='seconds'),
+                'days': [{'date': date.isoformat(), 'lessons': lessons} for date, lessons in sorted(by_date.items())],
+            })
+            self.dates = dates
+            self.modules = {code: json_response({'module': code, 'lessons': lessons})
+                            for code, lessons in modules.items()}
+            self.by_date = by_date
+            self.module_lessons = modules
+            self.image = None
+            self.mtime = mtime
+            logger.info("Loaded timetable from %s (%s days, %s modules)", self.csv_path, len(dates), len(modules))
+        return True
+
+    def week_image(self):
+        """PNG bytes and ETag of the rendered week, rendered once per CSV version"""
+        with self.lock:
+            if self.image is None:
+                buffer = io.BytesIO()
+                rasterize_layout(build_timetable_layout(load_timetable_dataframe(self.csv_path)), buffer)
+                body = buffer.getvalue()
+                self.image = (body, make_etag(body))
+            return self.image
+
+
+class TimetableAPI:
+    """
+    Minimal ASGI app serving the cached timetable:
+
+        GET /week               all days of the fetched week
+        GET /date/<YYYY-MM-DD>  one day ("today" and "tomorrow" also work)
+        GET /module/<code>      every lesson of a module, e.g. /module/INF1001
+        GET /week.png           the rendered week image
+
+    Responses carry an ETag and answer If-None-Match with 304, so clients can
+    poll cheaply. Nothing here ever triggers a portal scrape.
+    """
+
+    def __init__(self, cache=None):
+        self.cache = cache or TimetableCache()
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                if message['type'] == 'lifespan.startup':
+                    await asyncio.to_thread(self.cache.refresh)
+                    await send({'type': 'lifespan.startup.complete'})
+                elif message['type'] == 'lifespan.shutdown':
+                    await send({'type': 'lifespan.shutdown.complete'})
+                    return
+        if scope['type'] != 'http':
+            return
+
+        if scope['method'] not in ('GET', 'HEAD'):
+            await self.respond(send, scope, 405, *json_response({'error': 'Method not allowed'}))
+            return
+
+        if not await asyncio.to_thread(self.cache.refresh):
+            await self.respond(send, scope, 503, *json_response({'error': 'No timetable fetched yet'}))
+            return
+
+        path = scope['path'].rstrip('/')
+        content_type = 'application/json'
+        found = None
+
+        if path == '/week':
+            found = self.cache.week
+        elif path == '/week.png':
+            found = await asyncio.to_thread(self.cache.week_image)
+            content_type = 'image/png'
+        elif path.startswith('/date/'):
+            value = path[len('/date/'):]
+            today = datetime.date.today()
+            value = {'today': today, 'tomorrow': today + datetime.timedelta(days=1)}.get(value, value)
+            found = self.cache.dates.get(value.isoformat() if isinstance(value, datetime.date) else value)
+        elif path.startswith('/module/'):
+            found = self.cache.modules.get(module_key(path[len('/module/'):]))
+
+        if found is None:
+            await self.respond(send, scope, 404, *json_response({'error': 'Not found'}))
+            return
+
+        body, etag = found
+        if etag_matches(scope, etag):
+            await self.respond(send, scope, 304, b'', etag)
+            return
+        await self.respond(send, scope, 200, body, etag, content_type)
+
+    async def respond(self, send, scope, status, body, etag, content_type='application/json'):
+        headers = [
+            (b'etag', etag.encode()),
+            (b'cache-control', b'no-cache'),
+        ]
+        if status != 304:
+            headers += [
+                (b'content-type', content_type.encode() + (b'; charset=utf-8' if content_type == 'application/json' else b'')),
+                (b'content-length', str(len(body)).encode()),
+            ]
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' or status == 304 else body})
+
+
+def etag_matches(scope, etag):
+    """True if the request's If-None-Match covers etag"""
+    for name, value in scope['headers']:
+        if name == b'if-none-match':
+            candidates = [tag.strip() for tag in value.decode('latin-1').split(',')]
+            return '*' in candidates or any(tag.removeprefix('W/') == etag for tag in candidates)
+    return False
+
+
+app = TimetableAPI()
+
+
+def main():
+    """
+    Serve the cached timetable over HTTP with uvicorn
+    """
+    import argparse
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the latest fetched timetable over HTTP")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--csv', default=TIMETABLE_CSV_PATH, help="Timetable CSV written by get_timetable()")
+    args = parser.parse_args()
+
+    configure_logging()
+    uvicorn.run(TimetableAPI(TimetableCache(args.csv)), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+import datetime
+import logging
+import os
+import re
+
+import pandas as pd
+
+# Get the directory where this script is located
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TIMETABLE_CSV_PATH = os.path.join(SCRIPT_DIR, "weekly_schedule_timetable.csv")
+
+logger = logging.getLogger(__name__)
+
+# Day headers look like "Monday\n13 Oct"
+HEADER_DATE_PATTERN = re.compile(r'(\d{1,2})\s+(Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)', re.IGNORECASE)
+
+
+def next_working_day(start_date):
+    """
+    The next weekday after start_date (Friday and Saturday roll over to Monday)
+    """
+    weekday = start_date.weekday()
+    return start_date + datetime.timedelta(days=3 if weekday == 4 else (2 if weekday == 5 else 1))
+
+
+def parse_lesson(cell):
+    """
+    Parse a timetable cell "code|name|type|time|room" into a lesson dict,
+    or None if the cell is empty or in another format
+    """
+    if not (cell and isinstance(cell, str) and '|' in cell):
+        return None
+    parts = cell.split('|')
+    if len(parts) != 5:
+        return None
+    modCode, modName, modType, modTime, modRoom = parts
+    return {
+        "modCode": modCode,
+        "modName": modName,
+        "modType": modType,
+        "modTime": modTime,
+        "modRoom": modRoom
+    }
+
+
+def module_key(mod_code):
+    """
+    Normalise a module code for matching: "INF 1001 - ALL" and "inf1001" both
+    become "INF1001"
+    """
+    return mod_code.split(' - ')[0].replace(' ', '').upper()
+
+
+def extract_lessons(df, day_str):
+    """
+    Collect the unique lessons in the column(s) whose header contains day_str
+    (e.g. "13 Oct").
+
+    Returns:
+        list: Lesson dicts in timetable order.
+    """
+    lessons = []
+    for col in df.columns:
+        if day_str in col:
+            for row in df[col].dropna():
+                # Check if row is not empty and contains the expected format
+                if row and isinstance(row, str) and '|' in row:
+                    lesson = parse_lesson(row)
+                    # Ensure we have exactly 5 parts
+                    if lesson:
+                        # Check if this lesson is already in the list
+                        if lesson not in lessons:
+                            lessons.append(lesson)
+                            logger.debug("Lesson found: %s - %s", lesson['modCode'], lesson['modTime'])
+                        else:
+                            logger.debug("Duplicate lesson skipped: %s - %s", lesson['modCode'], lesson['modTime'])
+                    else:
+                        logger.debug("Skipping row with unexpected format: %s", row)
+                else:
+                    logger.debug("Skipping empty or invalid row: %r", row)
+
+    # Remove duplicates using a more robust method
+    unique_lessons = []
+    seen = set()
+    for lesson in lessons:
+        lesson_id = f"{lesson['modCode']}|{lesson['modTime']}|{lesson['modRoom']}"
+        if lesson_id not in seen:
+            seen.add(lesson_id)
+            unique_lessons.append(lesson)
+        else:
+            logger.debug("Removing duplicate: %s at %s", lesson['modCode'], lesson['modTime'])
+
+    return unique_lessons
+
+
+def column_dates(columns, reference_date=None):
+    """
+    Map day columns to calendar dates. Headers only carry day and month, so
+    the year closest to reference_date (default today) is used.
+
+    Returns:
+        dict: {column name: datetime.date} for every column with a date.
+    """
+    reference_date = reference_date or datetime.date.today()
+    dates = {}
+    for col in columns:
+        match = HEADER_DATE_PATTERN.search(str(col))
+        if not match:
+            continue
+        candidates = []
+        for year in (reference_date.year - 1, reference_date.year, reference_date.year + 1):
+            try:
+                candidates.append(datetime.datetime.strptime(
+                    f"{match.group(1)} {match.group(2).title()} {year}", "%d %b %Y").date())
+            except ValueError:
+                # 29 Feb outside a leap year
+                pass
+        if candidates:
+            dates[col] = min(candidates, key=lambda d: abs((d - reference_date).days))
+    return dates
+
+
+def load_timetable(csv_path=TIMETABLE_CSV_PATH):
+    """
+    Read the timetable CSV written by get_timetable()
+    """
+    return pd.read_csv(csv_path, keep_default_na=False)
+
+
+def lessons_by_date(df, reference_date=None):
+    """
+    Unique lessons for every dated column of the timetable.
+
+    Returns:
+        dict: {datetime.date: list of lesson dicts}.
+    """
+    by_date = {}
+    for col, date in column_dates(df.columns, reference_date).items():
+        lessons = []
+        seen = set()
+        for cell in df[col]:
+            lesson = parse_lesson(cell)
+            if lesson:
+                lesson_id = f"{lesson['modCode']}|{lesson['modTime']}|{lesson['modRoom']}"
+                if lesson_id not in seen:
+                    seen.add(lesson_id)
+                    lessons.append(lesson)
+        by_date.setdefault(date, []).extend(lessons)
+    return by_date
@@ -1,73 +1,168 @@
 import pandas as pd
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
+from functools import lru_cache
+import struct
+import zlib
+import logging
 import os
+from profiling import current_session, profile_mode, profile_stage, ProfileSession
+from run_log import configure_logging, dump_recent_logs
 
+logger = logging.getLogger(__name__)
 
-def create_simple_timetable_image(csv_file_path, output_image_path="timetable_simple.png"):
+# Base geometry of the full-size image. Layouts are computed in these units
+# and scaled at rasterization time.
+CELL_WIDTH = 500
+CELL_HEIGHT = 250
+HEADER_HEIGHT = 120
+HEADER_LINE_HEIGHT = 50
+CELL_LINE_HEIGHT = 40
+TEXT_PADDING = 30
+BORDER_WIDTH = 3
+
+# Font roles used by the display list: (truetype path, base size)
+FONT_SPECS = {
+    'header': ("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 34),
+    'module': ("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 26),
+    'cell': ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 26),
+    'small': ("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 26),
+}
+
+# Colour themes. Display items only reference roles, so any theme can be
+# applied to the same layout.
+THEMES = {
+    'default': {
+        'background': 'white',
+        'border': 'white',
+        'header': '#2E86AB',
+        'time': '#A23B72',
+        'course': ['#F18F01', '#C73E1D', '#592E83', '#1B998B', '#A4243B'],
+        'empty': '#F5F5F5',
+        'text_white': '#FFFFFF',
+        'text_dark': '#333333'
+    },
+    'dark': {
+        'background': '#121212',
+        'border': '#121212',
+        'header': '#1F4E64',
+        'time': '#5E2343',
+        'course': ['#8A5200', '#7A2412', '#3A1E55', '#11665D', '#661626'],
+        'empty': '#1E1E1E',
+        'text_white': '#EDEDED',
+        'text_dark': '#9E9E9E'
+    },
+}
+
+# Height in output pixels of each band drawn by rasterize_layout_striped()
+DEFAULT_BAND_HEIGHT = 256
+
+# Output presets for create_timetable_images()
+OUTPUT_PRESETS = {
+    'full': {'scale': 1.0},
+    'phone': {'scale': 0.5},
+    'thumbnail': {'scale': 0.2},
+}
+
+
+@lru_cache(maxsize=None)
+def get_font(role, scale=1.0):
     """
-    Create a simpler timetable image using PIL for better text handling
+    Load the font for a display-list role at the given scale (cached)
+    """
+    path, base_size = FONT_SPECS[role]
+    size = max(1, round(base_size * scale))
+    try:
+        return ImageFont.truetype(path, size)
+    except:
+        return ImageFont.load_default(size)
+
+
+def load_timetable_dataframe(csv_file_path):
+    """
+    Read the timetable CSV and keep only the weekday columns
     """
     # Read the CSV file
     df1 = pd.read_csv(csv_file_path)
     df = df1.iloc[:-3]
-    
+
     # Clean column names
     df.columns = [col.replace('\n', ' ') for col in df.columns]
-    
+
     # Filter out Saturday and Sunday columns
     columns_to_keep = []
     for col in df.columns:
         col_lower = col.lower()
         if not any(day in col_lower for day in ['saturday', 'sunday', 'sat|', 'sun|']):
             columns_to_keep.append(col)
-    
+
     df = df[columns_to_keep]
-    print(f"Filtered columns: {list(df.columns)}")
-    
-    # Image dimensions - increased further for much larger fonts
-    cell_width = 500
-    cell_height = 250
-    header_height = 120
-    
-    img_width = len(df.columns) * cell_width
-    img_height = header_height + len(df) * cell_height
-    
-    # Create image
-    img = Image.new('RGB', (img_width, img_height), 'white')
-    draw = ImageDraw.Draw(img)
-    
-    # Try to load fonts with doubled sizes
-    try:
-        font_header = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 34)  # was 22
-        font_module = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf", 26)  # was 16
-        font_cell = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 26)  # was 14
-        font_small = ImageFont.truetype("/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf", 26)  # was 12
-    except:
-        font_header = ImageFont.load_default(34)
-        font_module = ImageFont.load_default(26)
-        font_cell = ImageFont.load_default(26)
-        font_small = ImageFont.load_default(26)
-    
-    # Colors
-    colors = {
-        'header': '#2E86AB',
-        'time': '#A23B72', 
-        'course': ['#F18F01', '#C73E1D', '#592E83', '#1B998B', '#A4243B'],
-        'empty': '#F5F5F5',
-        'text_white': '#FFFFFF',
-        'text_dark': '#333333'
-    }
-    
+    logger.debug("Filtered columns: %s", list(df.columns))
+    return df
+
+
+def format_time_cell(time_text):
+    """
+    Convert a single start time (e.g. "9:00AM") into a one hour interval
+    """
+    time_text = str(time_text).strip()
+    if ':' in time_text and '-' not in time_text:
+        # Parse time and add 1 hour
+        try:
+            from datetime import datetime, timedelta
+            # Handle different time formats
+            if 'AM' in time_text.upper() or 'PM' in time_text.upper():
+                # 12-hour format
+                time_obj = datetime.strptime(time_text.upper(), '%I:%M%p')
+            else:
+                # 24-hour format
+                time_obj = datetime.strptime(time_text, '%H:%M')
+
+            # Add 1 hour
+            end_time = time_obj + timedelta(hours=1)
+
+            # Format back to original format
+            if 'AM' in time_text.upper() or 'PM' in time_text.upper():
+                start_formatted = time_obj.strftime('%I:%M%p')
+                end_formatted = end_time.strftime('%I:%M%p')
+            else:
+                start_formatted = time_obj.strftime('%H:%M')
+                end_formatted = end_time.strftime('%H:%M')
+
+            time_text = f"{start_formatted}  -  {end_formatted}"
+        except:
+            # If parsing fails, keep original text
+            logger.debug("Could not parse time %r, keeping it as is", time_text)
+    return time_text
+
+
+def build_timetable_layout(df):
+    """
+    Compute a resolution-independent display list for the timetable.
+
+    All text wrapping, cell merging and measuring happens here, once, at the
+    base geometry. The result is a dict with 'width', 'height' and 'items',
+    where each item is either a rectangle or a text run:
+
+        {'type': 'rect', 'box': (x0, y0, x1, y1), 'fill': role,
+         'color_index': n, 'span': (row, col, rows)}
+        {'type': 'text', 'x': center_x, 'y': top_y, 'text': str,
+         'font': role, 'fill': role}
+
+    Colour and font roles are resolved by rasterize_layout().
+    """
+    # Only used for measuring text at the base size
+    measure = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
     def wrap_text(text, font, max_width):
         """Wrap text to fit within max_width"""
         words = text.split(' ')
         lines = []
         current_line = ""
-        
+
         for word in words:
             test_line = current_line + (" " if current_line else "") + word
-            text_bbox = draw.textbbox((0, 0), test_line, font=font)
+            text_bbox = measure.textbbox((0, 0), test_line, font=font)
             text_width = text_bbox[2] - text_bbox[0]
             if text_width <= max_width:
                 current_line = test_line
@@ -79,198 +174,367 @@ def create_simple_timetable_image(csv_file_path, output_image_path="timetable_si
                     # Single word is too long, truncate it
                     lines.append(word[:15] + "..." if len(word) > 15 else word)
                     current_line = ""
-        
+
         if current_line:
             lines.append(current_line)
-        
+
         return lines
-    
-    # Draw headers
+
+    font_header = get_font('header')
+    font_module = get_font('module')
+    font_small = get_font('small')
+    max_text_width = CELL_WIDTH - TEXT_PADDING
+
+    items = []
+
+    # Headers
     for col_idx, col_name in enumerate(df.columns):
-        x = col_idx * cell_width
+        x = col_idx * CELL_WIDTH
         y = 0
-        
-        # Header background
-        draw.rectangle([x, y, x + cell_width, y + header_height], 
-                      fill=colors['header'], outline='white', width=3)
-        
-        # Header text with wrapping
-        wrapped_header = wrap_text(col_name, font_header, cell_width - 30)
-        line_height = 50  # was 25
-        total_height = len(wrapped_header) * line_height
-        start_y = y + (header_height - total_height) // 2
-        
+
+        items.append({'type': 'rect', 'box': (x, y, x + CELL_WIDTH, y + HEADER_HEIGHT),
+                      'fill': 'header', 'color_index': 0, 'span': None})
+
+        wrapped_header = wrap_text(col_name, font_header, max_text_width)
+        total_height = len(wrapped_header) * HEADER_LINE_HEIGHT
+        start_y = y + (HEADER_HEIGHT - total_height) // 2
+
         for i, line in enumerate(wrapped_header):
-            text_bbox = draw.textbbox((0, 0), line, font=font_header)
-            text_width = text_bbox[2] - text_bbox[0]
-            text_x = x + (cell_width - text_width) // 2
-            text_y = start_y + i * line_height
-            draw.text((text_x, text_y), line, fill=colors['text_white'], font=font_header)
-    
+            items.append({'type': 'text', 'x': x + CELL_WIDTH // 2,
+                          'y': start_y + i * HEADER_LINE_HEIGHT, 'text': line,
+                          'font': 'header', 'fill': 'text_white'})
+
     # Track merged cells
     drawn_cells = set()
-    
-    # Draw data cells with merging
-    for row_idx in range(len(df)):
-        for col_idx in range(len(df.columns)):
+    values = df.to_numpy(dtype=object)
+    n_rows, n_cols = values.shape
+
+    # Data cells with vertical merging
+    for row_idx in range(n_rows):
+        for col_idx in range(n_cols):
             if (row_idx, col_idx) in drawn_cells:
                 continue
-                
-            cell_value = df.iloc[row_idx, col_idx]
-            x = col_idx * cell_width
-            y = header_height + row_idx * cell_height
-            
+
+            cell_value = values[row_idx, col_idx]
+            is_empty = pd.isna(cell_value) or cell_value == ''
+            x = col_idx * CELL_WIDTH
+            y = HEADER_HEIGHT + row_idx * CELL_HEIGHT
+
             # Check for vertical merging
             merge_count = 1
-            if col_idx > 0 and not (pd.isna(cell_value) or cell_value == ''):
-                for check_row in range(row_idx + 1, len(df)):
-                    if df.iloc[check_row, col_idx] == cell_value:
+            if col_idx > 0 and not is_empty:
+                for check_row in range(row_idx + 1, n_rows):
+                    if values[check_row, col_idx] == cell_value:
                         merge_count += 1
                         drawn_cells.add((check_row, col_idx))
                     else:
                         break
-            
-            # Choose colors
+
+            # Choose colour roles
             if col_idx == 0:  # Time column
-                bg_color = colors['time']
-                text_color = colors['text_white']
-            elif pd.isna(cell_value) or cell_value == '':
-                bg_color = colors['empty']
-                text_color = colors['text_dark']
+                bg_role = 'time'
+                text_role = 'text_white'
+            elif is_empty:
+                bg_role = 'empty'
+                text_role = 'text_dark'
             else:
-                bg_color = colors['course'][col_idx % len(colors['course'])]
-                text_color = colors['text_white']
-            
-            # Draw cell background
-            cell_height_merged = cell_height * merge_count
-            draw.rectangle([x, y, x + cell_width, y + cell_height_merged], 
-                          fill=bg_color, outline='white', width=3)
-            
-            # Draw cell text
-            if not (pd.isna(cell_value) or cell_value == ''):
-                # Special handling for time column (first column)
-                if col_idx == 0:
-                    # Convert single time to time interval
-                    time_text = str(cell_value).strip()
-                    if ':' in time_text and '-' not in time_text:
-                        # Parse time and add 1 hour
-                        try:
-                            from datetime import datetime, timedelta
-                            # Handle different time formats
-                            if 'AM' in time_text.upper() or 'PM' in time_text.upper():
-                                # 12-hour format
-                                time_obj = datetime.strptime(time_text.upper(), '%I:%M%p')
-                            else:
-                                # 24-hour format
-                                time_obj = datetime.strptime(time_text, '%H:%M')
-                            
-                            # Add 1 hour
-                            end_time = time_obj + timedelta(hours=1)
-                            
-                            # Format back to original format
-                            if 'AM' in time_text.upper() or 'PM' in time_text.upper():
-                                start_formatted = time_obj.strftime('%I:%M%p')
-                                end_formatted = end_time.strftime('%I:%M%p')
-                            else:
-                                start_formatted = time_obj.strftime('%H:%M')
-                                end_formatted = end_time.strftime('%H:%M')
-                            
-                            time_text = f"{start_formatted}  -  {end_formatted}"
-                        except:
-                            # If parsing fails, keep original text
-                            print("Parsing failed")
-                            pass
-                    
-                    all_lines = [(time_text, font_cell)]
-                elif '|' in str(cell_value):
-                    parts = str(cell_value).split('|')
-                    if len(parts) >= 4:
-                        # Parse: MODULE_CODE - GROUP|Module Name|Type|Time|Location
-                        module_code = parts[0].strip()  # e.g., "INF 1001 - ALL"
-                        module_name = parts[1].strip()  # e.g., "Introduction to Computing"
-                        lesson_type = parts[2].strip()  # e.g., "Lecture"
-                        lesson_time = parts[3].strip()  # e.g., "9:00AM - 11:00AM"
-                        lesson_time_a = lesson_time.split(":")  # e.g., "Monday"
-                        lesson_time_b = int(lesson_time_a[0]) + 1
-                        lesson_time_c = lesson_time + " - " + str(lesson_time_b) + ":" + lesson_time_a[1]
-                        location = parts[4].strip() if len(parts) > 4 else ""  # e.g., "Online"
-                        
-                        # Prepare text lines with wrapping
-                        all_lines = []
-                        
-                        # Module code (no wrapping needed, usually short)
-                        all_lines.append((module_code, font_cell))
-                        
-                        # Module name with wrapping
-                        wrapped_name = wrap_text(module_name, font_module, cell_width - 30)
-                        for line in wrapped_name:
-                            all_lines.append((line, font_module))
-                        
-                        # Lesson type and time
-                        lesson_info = f"{lesson_type}"
-                        wrapped_info = wrap_text(lesson_info, font_small, cell_width - 30)
-                        for line in wrapped_info:
-                            all_lines.append((line, font_small))
-                        
-                        # Location if available
-                        if location:
-                            wrapped_location = wrap_text(location, font_small, cell_width - 30)
-                            for line in wrapped_location:
-                                all_lines.append((line, font_small))
-                    else:
-                        # Fallback for other formats
-                        text_lines = str(cell_value).split('|')
-                        all_lines = [(line, font_cell) for line in text_lines]
+                bg_role = 'course'
+                text_role = 'text_white'
+
+            cell_height_merged = CELL_HEIGHT * merge_count
+            items.append({'type': 'rect', 'box': (x, y, x + CELL_WIDTH, y + cell_height_merged),
+                          'fill': bg_role, 'color_index': col_idx,
+                          'span': (row_idx, col_idx, merge_count)})
+
+            if is_empty:
+                continue
+
+            if col_idx == 0:
+                all_lines = [(format_time_cell(cell_value), 'cell')]
+            elif '|' in str(cell_value):
+                parts = str(cell_value).split('|')
+                if len(parts) >= 4:
+                    # Parse: MODULE_CODE - GROUP|Module Name|Type|Time|Location
+                    module_code = parts[0].strip()  # e.g., "INF 1001 - ALL"
+                    module_name = parts[1].strip()  # e.g., "Introduction to Computing"
+                    lesson_type = parts[2].strip()  # e.g., "Lecture"
+                    location = parts[4].strip() if len(parts) > 4 else ""  # e.g., "Online"
+
+                    # Module code (no wrapping needed, usually short)
+                    all_lines = [(module_code, 'cell')]
+                    all_lines += [(line, 'module') for line in wrap_text(module_name, font_module, max_text_width)]
+                    all_lines += [(line, 'small') for line in wrap_text(lesson_type, font_small, max_text_width)]
+                    if location:
+                        all_lines += [(line, 'small') for line in wrap_text(location, font_small, max_text_width)]
                 else:
-                    all_lines = [(str(cell_value), font_cell)]
-                
-                # Calculate text positioning
-                line_height = 40  # was 20
-                total_text_height = len(all_lines) * line_height
-                start_y = y + (cell_height_merged - total_text_height) // 2
-                
-                for i, (line, font) in enumerate(all_lines):
-                    if line.strip():
-                        text_bbox = draw.textbbox((0, 0), line, font=font)
-                        text_width = text_bbox[2] - text_bbox[0]
-                        
-                        text_x = x + (cell_width - text_width) // 2
-                        text_y = start_y + i * line_height
-                        
-                        draw.text((text_x, text_y), line, fill=text_color, font=font)
-    
-    # Save image
-    img.save(output_image_path, 'PNG', quality=95)
+                    # Fallback for other formats
+                    all_lines = [(line, 'cell') for line in parts]
+            else:
+                all_lines = [(str(cell_value), 'cell')]
+
+            # Calculate text positioning
+            total_text_height = len(all_lines) * CELL_LINE_HEIGHT
+            start_y = y + (cell_height_merged - total_text_height) // 2
+
+            for i, (line, font_role) in enumerate(all_lines):
+                if line.strip():
+                    items.append({'type': 'text', 'x': x + CELL_WIDTH // 2,
+                                  'y': start_y + i * CELL_LINE_HEIGHT, 'text': line,
+                                  'font': font_role, 'fill': text_role})
+
+    return {
+        'width': n_cols * CELL_WIDTH,
+        'height': HEADER_HEIGHT + n_rows * CELL_HEIGHT,
+        'items': items
+    }
+
+
+def draw_layout_items(draw, items, scale=1.0, theme='default', offset_y=0):
+    """
+    Draw display-list items onto an ImageDraw at the given scale and theme.
+
+    offset_y (in output pixels) is subtracted from every y coordinate so the
+    same items can be drawn onto a partial canvas.
+    """
+    colors = THEMES[theme] if isinstance(theme, str) else theme
+    border_width = max(1, round(BORDER_WIDTH * scale))
+
+    for item in items:
+        if item['type'] == 'rect':
+            x0, y0, x1, y1 = item['box']
+            fill = colors[item['fill']]
+            if isinstance(fill, list):
+                fill = fill[item['color_index'] % len(fill)]
+            draw.rectangle([round(x0 * scale), round(y0 * scale) - offset_y,
+                            round(x1 * scale), round(y1 * scale) - offset_y],
+                           fill=fill, outline=colors['border'], width=border_width)
+        else:
+            draw.text((round(item['x'] * scale), round(item['y'] * scale) - offset_y),
+                      item['text'], fill=colors[item['fill']],
+                      font=get_font(item['font'], scale), anchor='ma')
+
+
+def rasterize_layout(layout, output_image_path, scale=1.0, theme='default'):
+    """
+    Draw a layout produced by build_timetable_layout() to a PNG file
+    """
+    colors = THEMES[theme] if isinstance(theme, str) else theme
+    img_width = max(1, round(layout['width'] * scale))
+    img_height = max(1, round(layout['height'] * scale))
+
+    img = Image.new('RGB', (img_width, img_height), colors['background'])
+    draw = ImageDraw.Draw(img)
+    draw_layout_items(draw, layout['items'], scale, colors)
+
+    img.save(output_image_path, 'PNG')
     return output_image_path
 
+
+def build_term_layout(dataframes):
+    """
+    Stack the layouts of several weekly timetables vertically into one poster
+    layout. Each week keeps its own header row.
+    """
+    items = []
+    width = 0
+    offset = 0
+    for df in dataframes:
+        week = build_timetable_layout(df)
+        for item in week['items']:
+            shifted = dict(item)
+            if item['type'] == 'rect':
+                x0, y0, x1, y1 = item['box']
+                shifted['box'] = (x0, y0 + offset, x1, y1 + offset)
+            else:
+                shifted['y'] = item['y'] + offset
+            items.append(shifted)
+        width = max(width, week['width'])
+        offset += week['height']
+
+    return {'width': width, 'height': offset, 'items': items}
+
+
+def _png_chunk(tag, data):
+    """Encode a single PNG chunk"""
+    chunk = tag + data
+    return struct.pack('>I', len(data)) + chunk + struct.pack('>I', zlib.crc32(chunk) & 0xffffffff)
+
+
+def _filter_scanlines(rows, previous):
+    """
+    PNG-filter a band of RGB rows (uint8 array of shape (height, width * 3)),
+    picking None, Sub or Up for each row, whichever leaves the smallest sum
+    of absolute (signed) differences. previous is the row above the band.
+    Returns the filtered scanlines, each prefixed with its filter type.
+    """
+    sub = rows.copy()
+    sub[:, 3:] -= rows[:, :-3]
+    above = np.vstack([previous[np.newaxis], rows[:-1]])
+    up = rows - above
+
+    candidates = np.stack([rows, sub, up])
+    cost = np.abs(candidates.view(np.int8).astype(np.int32)).sum(axis=2)
+    choice = cost.argmin(axis=0)
+    filtered = candidates[choice, np.arange(len(rows))]
+    return np.hstack([choice.astype(np.uint8)[:, np.newaxis], filtered]).tobytes()
+
+
+def _item_extent(item, scale):
+    """Vertical extent (top, bottom) of a display item in output pixels"""
+    if item['type'] == 'rect':
+        return round(item['box'][1] * scale), round(item['box'][3] * scale)
+    top = round(item['y'] * scale)
+    # Generous bound covering ascenders and descenders of the role's font
+    return top, top + round(FONT_SPECS[item['font']][1] * 2 * scale) + 1
+
+
+def rasterize_layout_striped(layout, output_image_path, scale=1.0, theme='default',
+                             band_height=DEFAULT_BAND_HEIGHT):
+    """
+    Draw a layout to a PNG file one horizontal band at a time.
+
+    Each band is drawn with the same items as rasterize_layout() and its rows
+    are filtered (per row, as Pillow does) and compressed straight into the
+    PNG stream, so peak memory is bounded by band_height rather than by the
+    full image height.
+    """
+    colors = THEMES[theme] if isinstance(theme, str) else theme
+    img_width = max(1, round(layout['width'] * scale))
+    img_height = max(1, round(layout['height'] * scale))
+    band_height = max(1, band_height)
+
+    # Sweep the items in order of their top edge so each band only looks at
+    # the items that can touch it
+    extents = sorted(((_item_extent(item, scale), idx) for idx, item in enumerate(layout['items'])),
+                     key=lambda entry: entry[0][0])
+    next_item = 0
+    active = []
+
+    compressor = zlib.compressobj(6)
+    previous = np.zeros(img_width * 3, dtype=np.uint8)
+    with open(output_image_path, 'wb') as f:
+        f.write(b'\x89PNG\r\n\x1a\n')
+        # 8-bit RGB, deflate, adaptive filtering, no interlace
+        f.write(_png_chunk(b'IHDR', struct.pack('>IIBBBBB', img_width, img_height, 8, 2, 0, 0, 0)))
+
+        for band_top in range(0, img_height, band_height):
+            band_bottom = min(band_top + band_height, img_height)
+
+            while next_item < len(extents) and extents[next_item][0][0] < band_bottom:
+                active.append(extents[next_item])
+                next_item += 1
+            # Keep draw order identical to the full rasterizer
+            active = sorted((entry for entry in active if entry[0][1] >= band_top), key=lambda entry: entry[1])
+
+            band = Image.new('RGB', (img_width, band_bottom - band_top), colors['background'])
+            draw = ImageDraw.Draw(band)
+            draw_layout_items(draw, [layout['items'][idx] for _, idx in active], scale, colors, offset_y=band_top)
+
+            rows = np.asarray(band, dtype=np.uint8).reshape(band.height, img_width * 3)
+            data = compressor.compress(_filter_scanlines(rows, previous))
+            previous = rows[-1].copy()
+            if data:
+                f.write(_png_chunk(b'IDAT', data))
+
+        f.write(_png_chunk(b'IDAT', compressor.flush()))
+        f.write(_png_chunk(b'IEND', b''))
+
+    return output_image_path
+
+
+def create_term_timetable_image(csv_file_paths, output_image_path="timetable_term.png",
+                                scale=1.0, theme='default', band_height=DEFAULT_BAND_HEIGHT):
+    """
+    Render a term-long poster from several weekly timetable CSVs using the
+    striped rasterizer
+    """
+    layout = build_term_layout(load_timetable_dataframe(path) for path in csv_file_paths)
+    return rasterize_layout_striped(layout, output_image_path, scale, theme, band_height)
+
+
+def create_timetable_images(csv_file_path, outputs, profile=None):
+    """
+    Render several images of the same timetable from one shared layout.
+
+    Args:
+        csv_file_path (str): Path to the weekly timetable CSV.
+        outputs (list): Dicts with 'path' and optionally 'scale', 'preset'
+            (a key of OUTPUT_PRESETS), 'theme' (a key of THEMES) and
+            'striped' (draw in bounded-memory bands).
+        profile (bool | str, optional): Profile layout and rasterization,
+            see get_timetable().
+
+    Returns:
+        list: The paths written, in the same order as outputs.
+    """
+    if profile_mode(profile) and current_session() is None:
+        with ProfileSession(profile_mode(profile), label='render'):
+            return create_timetable_images(csv_file_path, outputs)
+
+    with profile_stage('load_csv'):
+        df = load_timetable_dataframe(csv_file_path)
+    with profile_stage('layout'):
+        layout = build_timetable_layout(df)
+
+    written = []
+    for output in outputs:
+        preset = OUTPUT_PRESETS.get(output.get('preset', 'full'), {})
+        scale = output.get('scale', preset.get('scale', 1.0))
+        theme = output.get('theme', 'default')
+        with profile_stage(f"rasterize_{output.get('preset', scale)}"):
+            if output.get('striped'):
+                written.append(rasterize_layout_striped(layout, output['path'], scale, theme))
+            else:
+                written.append(rasterize_layout(layout, output['path'], scale, theme))
+    return written
+
+
+def create_simple_timetable_image(csv_file_path, output_image_path="timetable_simple.png", profile=None):
+    """
+    Create a simpler timetable image using PIL for better text handling
+    """
+    return create_timetable_images(csv_file_path, [{'path': output_image_path}], profile)[0]
+
 def main():
     """
     Main function to run the timetable image generator as a standalone script
     """
     import sys
-    
+
+    configure_logging()
+
     # Default file paths
     csv_file = "weekly_schedule_timetable.csv"
     output_file = "timetable_image.png"
-    
+
+    # --profile[=sampling] enables profiling; the rest are file paths
+    profile = None
+    args = []
+    for arg in sys.argv[1:]:
+        if arg.startswith('--profile'):
+            profile = arg.partition('=')[2] or True
+        else:
+            args.append(arg)
+
     # Check if custom file paths are provided as command line arguments
-    if len(sys.argv) > 1:
-        csv_file = sys.argv[1]
-    if len(sys.argv) > 2:
-        output_file = sys.argv[2]
-    
+    if len(args) > 0:
+        csv_file = args[0]
+    if len(args) > 1:
+        output_file = args[1]
+
     # Check if CSV file exists
     if not os.path.exists(csv_file):
-        print(f"Error: CSV file '{csv_file}' not found.")
-        print("Usage: python timetable_image_generator.py [csv_file] [output_image]")
+        logger.error("CSV file '%s' not found. Usage: python timetable_image_generator.py "
+                     "[--profile[=sampling]] [csv_file] [output_image]", csv_file)
         return
-    
+
     try:
-        print(f"Generating timetable image from '{csv_file}'...")
-        result_path = create_simple_timetable_image(csv_file, output_file)
-        print(f"Timetable image successfully saved to: {result_path}")
+        logger.info("Generating timetable image from '%s'...", csv_file)
+        result_path = create_simple_timetable_image(csv_file, output_file, profile)
+        logger.info("Timetable image successfully saved to: %s", result_path)
     except Exception as e:
-        print(f"Error generating timetable image: {e}")
+        logger.error("Error generating timetable image: %s", e)
+        dump_recent_logs("Image generation failed")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()